@@ -0,0 +1,30 @@
+# Import libraries
+import pandas as pd
+
+from datetime import datetime
+from google_play_scraper import app
+from mongo_schema import APP_SNAPSHOT_PROJECTION
+from targets import target_match
+
+# Store listing fields kept with every snapshot
+APP_FIELDS = ["installs", "realInstalls", "score", "ratings", "reviews", "histogram", "version", "updated"]
+
+# Save today's store listing numbers, one document per target and day so reruns overwrite instead of piling up
+def snapshot_app(collection, target):
+    details = app(target["app_id"], lang=target["lang"], country=target["country"])
+    taken_at = datetime.utcnow()
+    day = datetime(taken_at.year, taken_at.month, taken_at.day)
+
+    doc = {**target_match(target), "day": day, "taken_at": taken_at, **{field: details.get(field) for field in APP_FIELDS}}
+    collection.replace_one({**target_match(target), "day": day}, doc, upsert=True)
+    return doc
+
+def latest_snapshot(collection, target):
+    return collection.find_one(target_match(target), APP_SNAPSHOT_PROJECTION, sort=[("day", -1)])
+
+# Installs and ratings of every snapshot of one target between start and end, oldest first
+def load_app_history(collection, target, start, end):
+    docs = collection.find({**target_match(target), "day": {"$gte": start, "$lte": end}}, APP_SNAPSHOT_PROJECTION).sort("day", 1)
+    df = pd.DataFrame(list(docs), columns=["day", "realInstalls", "ratings", "score"])
+    df["day"] = pd.to_datetime(df["day"])
+    return df.set_index("day")
@@ -0,0 +1,130 @@
+# Import libraries
+import argparse
+import os
+import time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from google_play_scraper.features.reviews import MAX_COUNT_EACH_FETCH
+from google_play_scraper import app
+from pymongo import MongoClient
+from scraper import scan_pages, token_from_doc, token_to_doc
+from enricher import Enricher
+from llm_client import SharedTokenBucket
+from mongo_schema import ensure_indexes
+from dedupe import ReviewIdIndex
+from writer import ReviewWriter
+from pipeline import dedupe_stage, enrich_stage, negatives_stage, normalize_stage, write_stage
+from rollups import backfill_rollups
+from parquet_export import backfill_export
+from run_stats import RunStats
+from targets import target_key
+
+def format_duration(seconds):
+    return str(timedelta(seconds=int(seconds)))
+
+# Page through the whole review history, enriching and storing pages in a worker pool while the next ones are scraped
+def backfill(db, app_id, lang, country, workers=4, max_in_flight=8, pages_per_minute=60, page_size=MAX_COUNT_EACH_FETCH, restart=False):
+    state_collection = db["backfill_state"]
+    key = target_key({"app_id": app_id, "lang": lang, "country": country})
+    state = state_collection.find_one({"_id": key})
+    if restart or state is None:
+        state = {"_id": key, "token": None, "pages": 0, "scraped": 0, "stored": 0, "done": False, "started_at": datetime.utcnow()}
+    if state["done"]:
+        print(f"The backfill of {key} already finished, pass --restart to run it again")
+        return state
+    resumed = state["token"] is not None
+
+    ensure_indexes(db)
+    collection = db["google_play_store_reviews"]
+    review_index = ReviewIdIndex.load(collection)
+    writer = ReviewWriter(collection)
+    stats = RunStats(model="gpt-3.5-turbo")
+    enricher = Enricher(db, stats, model=stats.model)
+
+    # The number of reviews on the store listing, only used for the ETA
+    try:
+        total = app(app_id, lang=lang, country=country)["reviews"]
+    except Exception as error:
+        print(f"Could not read the number of reviews, no ETA will be shown: {error}")
+        total = None
+
+    def store(chunk):
+        write_stage(normalize_stage(enrich_stage([chunk], enricher.enrich, stats), stats), writer, stats=stats)
+        return len(chunk["reviews"])
+
+    # A page is only checkpointed once it and every page before it are stored, so a restart never skips one
+    def checkpoint(future, page_state):
+        state["stored"] += future.result()
+        state.update(page_state)
+        state_collection.replace_one({"_id": key}, state, upsert=True)
+
+        elapsed = time.perf_counter() - start
+        rate = (state["scraped"] - scraped_at_start) / elapsed if elapsed > 0 else 0
+        progress = f"Page {state['pages']:,}: {state['scraped']:,} reviews scraped, {state['stored']:,} new stored, {rate:,.0f} reviews/s"
+        if total and rate > 0:
+            progress += f", {min(state['scraped'] / total, 1):.1%} of {total:,}, ETA {format_duration(max(total - state['scraped'], 0) / rate)}"
+        print(progress)
+
+    start = time.perf_counter()
+    scraped_at_start = state["scraped"]
+    n_pages = state["pages"]
+    n_scraped = state["scraped"]
+    token = token_from_doc(state["token"]) if resumed else None
+    # The same Google Play limiter the daily job's scheduler uses
+    limiter = SharedTokenBucket(pages_per_minute) if pages_per_minute > 0 else None
+    pages = scan_pages(app_id, lang, country, token, None, set(), page_size, limiter)
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for page, token, _, exhausted in pages:
+            # An expired token gives nothing back, which must not be mistaken for the end of the history
+            if resumed and len(page) == 0:
+                print("The saved continuation token returned nothing, it has probably expired; pass --restart to scan again, stored reviews are skipped")
+                return state
+            resumed = False
+
+            n_pages += 1
+            n_scraped += len(page)
+            chunk = next(negatives_stage(dedupe_stage([{"reviews": page, "checkpoint": lambda: None}], review_index)))
+            page_state = {"token": None if exhausted else token_to_doc(token), "pages": n_pages, "scraped": n_scraped, "done": exhausted}
+            in_flight.append((pool.submit(store, chunk), page_state))
+
+            # Bound the pages held in memory, and checkpoint whatever finished in order
+            while len(in_flight) >= max_in_flight or (len(in_flight) > 0 and in_flight[0][0].done()):
+                checkpoint(*in_flight.popleft())
+
+        while len(in_flight) > 0:
+            checkpoint(*in_flight.popleft())
+
+    for report in enricher.reports():
+        print(report)
+    print(writer.report())
+    print(stats.report())
+    return state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape, enrich and store the full review history, resuming from the last checkpoint.")
+    parser.add_argument("--app-id", default="com.vidio.android")
+    parser.add_argument("--lang", default="id")
+    parser.add_argument("--country", default="id")
+    parser.add_argument("--workers", type=int, default=4, help="pages enriched and written at the same time")
+    parser.add_argument("--max-in-flight", type=int, default=8, help="scraped pages waiting to be stored before scraping pauses")
+    parser.add_argument("--pages-per-minute", type=float, default=60, help="Google Play requests per minute, 0 for no limit")
+    parser.add_argument("--restart", action="store_true", help="scan the history again from the newest review")
+    args = parser.parse_args()
+
+    client = MongoClient(
+        os.environ["MONGODB_URL"],
+        serverSelectionTimeoutMS=300000
+    )
+    db = client["vidio"]
+    state = backfill(db, args.app_id, args.lang, args.country, args.workers, max(args.max_in_flight, args.workers), args.pages_per_minute, restart=args.restart)
+
+    if state["done"]:
+        # Rebuild what is derived from the stored reviews
+        print(f"Rebuilt {backfill_rollups(db['google_play_store_reviews'], db['daily_rollups']):,} daily rollups")
+        if "PARQUET_EXPORT_PATH" in os.environ:
+            n_reviews, n_days = backfill_export(db["google_play_store_reviews"], os.environ["PARQUET_EXPORT_PATH"])
+            print(f"Exported {n_reviews:,} reviews in {n_days:,} daily partitions")
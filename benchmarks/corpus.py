@@ -0,0 +1,69 @@
+# Import libraries
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+
+# Newest review of every synthetic corpus, fixed so runs on different days stay comparable
+NEWEST_AT = datetime(2023, 6, 1, 9, 0, 0)
+
+# Complaints per topic, written the way Play Store users write them
+COMPLAINTS = {
+    "Advertisement": ["iklan terus", "iklannya kebanyakan", "baru nonton udah iklan", "iklan ga bisa di skip", "iklan judi mulu"],
+    "Watching Experience": ["gambar buram", "subtitle telat", "suara ga sinkron", "nonton bola patah patah", "kualitas video jelek"],
+    "Package": ["paket premier mahal", "udah bayar tapi ga bisa nonton", "langganan kepotong terus", "paket diamond ga aktif", "refund susah"],
+    "Technical": ["aplikasi keluar sendiri", "ga bisa login", "error terus", "layar hitam doang", "update malah tambah parah"],
+    "Network": ["buffering terus", "lemot banget padahal sinyal bagus", "loading lama", "koneksi putus putus", "muter muter doang"],
+    "Others": ["cs ga respon", "akun hilang", "kecewa", "ga sesuai", "tolong diperbaiki"]
+}
+PRAISES = ["mantap", "bagus sekali", "keren aplikasinya", "suka banget", "lancar jaya", "sangat membantu", "recommended", "the best"]
+FILLERS = ["", "", "min", "tolong", "bgt", "parah", "gk jelas", "udh lama", "sumpah"]
+EMOJIS = ["", "", "", "😡", "😭", "👍", "🙏", "🔥", "😤"]
+
+SCORE_PROBABILITIES = [0.35, 0.08, 0.07, 0.10, 0.40]
+VERSIONS = ["6.20.1", "6.21.0", "6.22.3", "6.23.0", None]
+
+# Synthetic reviews newest first, like Google Play returns them; `distinct` is the share of texts with a unique detail
+def make_corpus(n_reviews, seed=0, distinct=0.7, newest_at=NEWEST_AT):
+    rng = np.random.default_rng(seed)
+    topics = list(COMPLAINTS)
+
+    scores = rng.choice(np.arange(1, 6), size=n_reviews, p=SCORE_PROBABILITIES)
+    topic_ids = rng.integers(0, len(topics), size=n_reviews)
+    phrase_ids = rng.integers(0, 5, size=(n_reviews, 2))
+    praise_ids = rng.integers(0, len(PRAISES), size=n_reviews)
+    filler_ids = rng.integers(0, len(FILLERS), size=n_reviews)
+    emoji_ids = rng.integers(0, len(EMOJIS), size=n_reviews)
+    details = np.where(rng.random(n_reviews) < distinct, rng.integers(1, 1_000_000, size=n_reviews), 0)
+
+    texts = []
+    for i in range(n_reviews):
+        if scores[i] <= 3:
+            phrases = COMPLAINTS[topics[topic_ids[i]]]
+            text = f"{phrases[phrase_ids[i, 0]]}, {phrases[phrase_ids[i, 1]]}"
+        else:
+            text = PRAISES[praise_ids[i]]
+        if details[i] > 0:
+            text += f" udah {details[i]} kali"
+        texts.append(" ".join(part for part in [text, FILLERS[filler_ids[i]], EMOJIS[emoji_ids[i]]] if part))
+
+    # Roughly 500 reviews a day, spread over at least a month
+    n_days = max(30, n_reviews // 500)
+    offsets = np.sort(rng.integers(0, n_days * 86_400, size=n_reviews))
+    at = pd.Timestamp(newest_at) - pd.to_timedelta(offsets, unit="s")
+
+    replied = rng.random(n_reviews) < 0.05
+    replied_at = (at + pd.to_timedelta(rng.integers(3_600, 86_400, size=n_reviews), unit="s")).where(replied)
+
+    return pd.DataFrame({
+        "reviewId": [f"bench-{seed}-{i:08d}" for i in range(n_reviews)],
+        "userName": [f"Pengguna {i}" for i in rng.integers(0, max(1, n_reviews // 3), size=n_reviews)],
+        "userImage": "https://play-lh.googleusercontent.com/a/default-user",
+        "content": texts,
+        "score": scores,
+        "thumbsUpCount": rng.poisson(0.5, size=n_reviews),
+        "reviewCreatedVersion": rng.choice(np.array(VERSIONS, dtype=object), size=n_reviews),
+        "at": at,
+        "replyContent": np.where(replied, "Hai, mohon maaf atas ketidaknyamanannya. Silakan hubungi CS kami.", None),
+        "repliedAt": replied_at
+    })
@@ -0,0 +1,129 @@
+# Import libraries
+import asyncio
+import contextlib
+import json
+import random
+import openai
+
+from datetime import timedelta
+from unittest import mock
+from google_play_scraper.features.reviews import _ContinuationToken
+from benchmarks.corpus import COMPLAINTS
+
+# Stand-in for google_play_scraper.reviews that pages through a synthetic corpus with continuation tokens
+class FakePlayStore:
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.calls = 0
+
+    def reviews(self, app_id, lang="en", country="us", sort=None, count=100, filter_score_with=None, continuation_token=None):
+        self.calls += 1
+        start = int(continuation_token.token) if continuation_token is not None else 0
+        end = min(start + count, len(self.corpus))
+        page = self.corpus.iloc[start:end].astype(object)
+        result = page.where(page.notna(), None).to_dict("records")
+
+        token = str(end) if end < len(self.corpus) else None
+        return result, _ContinuationToken(token, lang, country, sort, count, filter_score_with)
+
+    def app(self, app_id, lang="en", country="us"):
+        return {
+            "installs": "50.000.000+",
+            "realInstalls": 50_000_000 + len(self.corpus),
+            "score": round(float(self.corpus["score"].mean()), 2),
+            "ratings": len(self.corpus),
+            "reviews": len(self.corpus),
+            "histogram": self.corpus["score"].value_counts().reindex(range(1, 6), fill_value=0).tolist(),
+            "version": "6.23.0",
+            "updated": 1685600000
+        }
+
+# Guess the topic of a synthetic review from the complaint phrases it contains
+def topic_of(text):
+    for topic, phrases in COMPLAINTS.items():
+        if any(phrase in text for phrase in phrases):
+            return topic
+    return "Others"
+
+# Stand-in for openai.ChatCompletion.acreate with a configurable latency and share of failed requests
+class FakeOpenAI:
+    def __init__(self, latency=0.05, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.prompt_chars = 0
+
+    def answer(self, prompt):
+        if "Reviews: " in prompt:
+            items = json.loads(prompt[prompt.index("Reviews: ") + len("Reviews: "):])
+            return json.dumps({"items": [
+                {"id": item["id"], "english": f"translated {item['text']}", "topic": topic_of(item["text"])}
+                for item in items
+            ]}, ensure_ascii=False)
+
+        text = prompt[prompt.index('"') + 1:prompt.rindex('"')]
+        if prompt.startswith("Please translate"):
+            return f"[EN: translated {text}]"
+        return f"[Topic: {topic_of(text)}]"
+
+    async def acreate(self, model=None, messages=None, **kwargs):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        self.prompt_chars += len(prompt)
+
+        await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            raise openai.error.RateLimitError("Fake rate limit")
+
+        content = self.answer(prompt)
+        return {
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4}
+        }
+
+# Route every Google Play and OpenAI call made by the ingest modules to the stand-ins
+@contextlib.contextmanager
+def patched(play, llm):
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch("scraper.reviews", play.reviews))
+        stack.enter_context(mock.patch("app_metadata.app", play.app))
+        stack.enter_context(mock.patch("openai.ChatCompletion.acreate", llm.acreate))
+        yield
+
+# mongomock does not implement $dateTrunc, which the rollups group by, so add the units they use
+def add_date_trunc():
+    import mongomock.aggregate as aggregate
+
+    if "$dateTrunc" in aggregate.date_operators:
+        return
+    handle_date_operator = aggregate._Parser._handle_date_operator
+
+    def handle(self, operator, values):
+        if operator != "$dateTrunc":
+            return handle_date_operator(self, operator, values)
+        date = self.parse(values["date"]).replace(hour=0, minute=0, second=0, microsecond=0)
+        if values["unit"] == "week":
+            date -= timedelta(days=(date.weekday() + 1) % 7)
+        elif values["unit"] == "month":
+            date = date.replace(day=1)
+        return date
+
+    aggregate.date_operators.append("$dateTrunc")
+    aggregate._Parser._handle_date_operator = handle
+
+# A fresh database, in memory with mongomock unless a local mongod URL is given
+def make_database(mongodb_url=None, name="vidio_benchmark"):
+    if mongodb_url is not None:
+        from pymongo import MongoClient
+
+        client = MongoClient(mongodb_url)
+        client.drop_database(name)
+        return client[name]
+
+    import mongomock
+
+    add_date_trunc()
+    return mongomock.MongoClient()[name]
@@ -0,0 +1,316 @@
+# Import libraries
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+from unittest import mock
+from google_play_scraper.features.reviews import MAX_COUNT_EACH_FETCH
+from benchmarks.corpus import make_corpus
+from benchmarks.fakes import FakeOpenAI, FakePlayStore, make_database, patched
+from dashboard_cache import DayCache
+from dashboard_queries import DAY_COLUMNS, load_daily_rows, load_topic_reviews, make_backend, to_stats
+from dedupe import ReviewIdIndex
+from enrichment import TranslationRepair, enrich_reviews, topic_prompt, translation_prompt, with_fallbacks
+from enrichment_cache import MongoEnrichmentCache
+from llm_client import LLMClient
+from mongo_schema import ensure_indexes
+from near_duplicates import NearDuplicateIndex
+from parquet_export import backfill_export
+from refresh import ReviewRefresh
+from pipeline import dedupe_stage, enrich_stage, negatives_stage, normalize_stage, run_pipeline, scrape_stage, write_stage
+from rollups import backfill_rollups, update_rollups
+from scraper import iter_review_pages
+from targets import DEFAULT_TARGET
+from topics import TOPICS
+from writer import ReviewWriter
+
+TARGET = DEFAULT_TARGET
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Time a single call, keeping its result
+def timed(stages, name, fn, **extra):
+    start = time.perf_counter()
+    result = fn()
+    stages[name] = {"seconds": round(time.perf_counter() - start, 6), **extra}
+    return result
+
+# Median of `repeat` calls, for the cheap dashboard queries
+def timed_repeat(queries, name, fn, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    queries[name] = {"seconds": round(statistics.median(seconds), 6), "repeat": repeat}
+
+# The same enrichment the daily job does: cache, near-duplicate clusters, batched LLM calls, then translation repair
+def make_enrich(db, args, near_duplicates=True):
+    llm = LLMClient(max_concurrency=args.llm_concurrency, rpm=args.llm_rpm, tpm=args.llm_tpm, base_delay=args.llm_retry_delay)
+
+    def translate_to_english(texts):
+        return llm.map([translation_prompt(text) for text in texts], default=None)
+
+    def assign_topic(texts):
+        return llm.map([topic_prompt(text) for text in texts], default=None)
+
+    repair = TranslationRepair(translate_to_english)
+    cache = MongoEnrichmentCache(db["enrichment_cache"], "benchmark")
+
+    def enrich_texts(texts):
+        english, topics = enrich_reviews(llm, texts, translate_to_english, assign_topic)
+        return repair.run(texts, english), topics
+
+    if not near_duplicates or args.no_near_duplicates:
+        return lambda texts: with_fallbacks(*cache.enrich(texts, enrich_texts)), cache
+    index = NearDuplicateIndex(threshold=args.near_duplicate_threshold)
+    return lambda texts: with_fallbacks(*cache.enrich(texts, lambda missing: index.enrich(missing, enrich_texts))), cache
+
+def llm_stats(llm):
+    return {"llm_calls": llm.calls, "llm_errors": llm.errors, "llm_prompt_chars": llm.prompt_chars}
+
+# Run every ingest stage on its own over the whole corpus, so each one is timed without the others overlapping it
+def bench_ingest(db, corpus, args):
+    play = FakePlayStore(corpus)
+    llm = FakeOpenAI(args.llm_latency, args.llm_error_rate, args.seed)
+    stages = {}
+
+    with patched(play, llm):
+        ensure_indexes(db)
+        collection = db["google_play_store_reviews"]
+        review_index = timed(stages, "load_review_index", lambda: ReviewIdIndex.load(collection))
+
+        pages = timed(stages, "scrape", lambda: list(iter_review_pages(collection, db["ingest_state"], TARGET["app_id"], TARGET["lang"], TARGET["country"])))
+        stages["scrape"]["play_calls"] = play.calls
+
+        chunks = list(scrape_stage(pages))
+        chunks = timed(stages, "dedupe", lambda: list(dedupe_stage(chunks, review_index)))
+        chunks = timed(stages, "negatives", lambda: list(negatives_stage(chunks)))
+
+        enrich, cache = make_enrich(db, args)
+        chunks = timed(stages, "enrich", lambda: list(enrich_stage(chunks, enrich)))
+        stages["enrich"].update({"texts": sum(len(chunk["negatives"]) for chunk in chunks), "cache_hit_rate": round(cache.hit_rate(), 4), **llm_stats(llm)})
+
+        chunks = timed(stages, "normalize", lambda: list(normalize_stage(chunks)))
+
+        writer = ReviewWriter(collection)
+        timed(stages, "write", lambda: write_stage(chunks, writer))
+        stages["write"]["documents"] = writer.written
+
+        timed(stages, "update_rollups", lambda: update_rollups(collection, db["daily_rollups"], TARGET, corpus["at"].iloc[:args.rollup_days_sample]))
+    return stages
+
+# Cluster sizes of the negative reviews and the LLM calls the clustering saves on top of the exact cache
+def bench_near_duplicates(corpus, args):
+    texts = corpus.loc[corpus["score"] <= 3, "content"].tolist()
+    results = {"texts": len(texts)}
+
+    index = NearDuplicateIndex(threshold=args.near_duplicate_threshold)
+    start = time.perf_counter()
+    index.enrich(texts, lambda leaders: ([None] * len(leaders), [None] * len(leaders)))
+    results["cluster_seconds"] = round(time.perf_counter() - start, 6)
+
+    sizes = index.cluster_sizes()
+    results.update({
+        "clusters": len(sizes),
+        "clusters_with_variants": int((sizes > 1).sum()),
+        "largest_cluster": int(sizes.max()) if len(sizes) > 0 else 0,
+        "mean_cluster_size": round(float(sizes.mean()), 4) if len(sizes) > 0 else 0,
+        "cluster_size_histogram": {
+            label: int(((sizes >= low) & (sizes <= high)).sum())
+            for label, low, high in [("1", 1, 1), ("2-5", 2, 5), ("6-20", 6, 20), ("21-100", 21, 100), ("101+", 101, len(texts) + 1)]
+        },
+        "enrichments_saved": len(texts) - len(sizes)
+    })
+
+    # The same texts through the enrichment, chunked like the pipeline, with and without the clustering
+    for name, near_duplicates in [("exact_cache_only", False), ("with_near_duplicates", True)]:
+        llm = FakeOpenAI(0, 0, args.seed)
+        with mock.patch("openai.ChatCompletion.acreate", llm.acreate):
+            enrich, _ = make_enrich(make_database(args.mongodb_url, "vidio_benchmark_near_duplicates"), args, near_duplicates)
+            start = time.perf_counter()
+            for i in range(0, len(texts), 199):
+                enrich(texts[i:i + 199])
+        results[name] = {"seconds": round(time.perf_counter() - start, 6), **llm_stats(llm)}
+    results["llm_calls_saved"] = results["exact_cache_only"]["llm_calls"] - results["with_near_duplicates"]["llm_calls"]
+    return results
+
+# Refresh the stored corpus after editing a share of it; the writes and LLM calls should follow the edits, not the corpus size
+def bench_refresh(db, corpus, args):
+    # Not the corpus seed, whose first draws picked the scores
+    rng = np.random.default_rng(args.seed + 1)
+    edited = corpus.copy()
+    picked = rng.random(len(corpus)) < args.refresh_edit_rate
+    kinds = rng.integers(0, 3, size=len(corpus))
+
+    text_edits = picked & (kinds == 0)
+    score_edits = picked & (kinds == 1)
+    replies = picked & (kinds == 2)
+    edited.loc[text_edits, "content"] += " (sudah diupdate, masih sama aja)"
+    edited.loc[score_edits, "score"] = 6 - edited.loc[score_edits, "score"]
+    edited.loc[replies, "replyContent"] = "Hai, terima kasih atas masukannya."
+    edited.loc[replies, "repliedAt"] = edited.loc[replies, "at"] + pd.Timedelta(hours=6)
+
+    llm = FakeOpenAI(args.llm_latency, args.llm_error_rate, args.seed)
+    stages = {}
+    with mock.patch("openai.ChatCompletion.acreate", llm.acreate):
+        enrich, _ = make_enrich(db, args)
+        writer = ReviewWriter(db["google_play_store_reviews"])
+        refresh = ReviewRefresh(db, writer, enrich)
+        pages = [edited.iloc[i:i + MAX_COUNT_EACH_FETCH] for i in range(0, len(edited), MAX_COUNT_EACH_FETCH)]
+        timed(stages, "refresh", lambda: [refresh.refresh_page(page) for page in pages])
+        stages["refresh"].update({"edited": int(picked.sum()), "documents": writer.written, **refresh.counts, **llm_stats(llm)})
+    return stages
+
+# The whole streaming pipeline on an empty database, with scraping and enrichment overlapping the writes
+def bench_end_to_end(db, corpus, args):
+    play = FakePlayStore(corpus)
+    llm = FakeOpenAI(args.llm_latency, args.llm_error_rate, args.seed)
+    stages = {}
+
+    with patched(play, llm):
+        ensure_indexes(db)
+        collection = db["google_play_store_reviews"]
+        enrich, _ = make_enrich(db, args)
+        writer = ReviewWriter(collection)
+
+        def after_write(reviews):
+            update_rollups(collection, db["daily_rollups"], TARGET, reviews["at"])
+
+        pages = iter_review_pages(collection, db["ingest_state"], TARGET["app_id"], TARGET["lang"], TARGET["country"])
+        timed(stages, "pipeline", lambda: run_pipeline(pages, ReviewIdIndex.load(collection), enrich, writer, after_write=after_write))
+        stages["pipeline"].update({"documents": writer.written, **llm_stats(llm)})
+    return stages
+
+# Time the queries behind the dashboard over the whole corpus
+def bench_dashboard(db, corpus, args):
+    queries = {}
+    collection = db["google_play_store_reviews"]
+    first_day = corpus["at"].min().normalize()
+    last_day = corpus["at"].max().normalize()
+    start = first_day.to_pydatetime()
+    end = (last_day + pd.Timedelta(days=1)).to_pydatetime()
+
+    db["daily_rollups"].delete_many({})
+    timed_repeat(queries, "daily_rows_raw_aggregation", lambda: load_daily_rows(db, TARGET, first_day, last_day), args.repeat)
+    timed(queries, "backfill_rollups", lambda: backfill_rollups(collection, db["daily_rollups"]))
+    timed_repeat(queries, "daily_rows_rollups", lambda: load_daily_rows(db, TARGET, first_day, last_day), args.repeat)
+
+    df_days = load_daily_rows(db, TARGET, first_day, last_day)
+    for resample in ["D", "W", "M"]:
+        timed_repeat(queries, f"to_stats_{resample}", lambda: to_stats(df_days, resample), args.repeat)
+
+    cache = DayCache(lambda first, last: load_daily_rows(db, TARGET, first, last), DAY_COLUMNS)
+    timed(queries, "day_cache_cold", lambda: cache.get(first_day, last_day, "v1"))
+    timed_repeat(queries, "day_cache_warm", lambda: cache.get(first_day, last_day, "v1"), args.repeat)
+
+    # The first page of every topic, then a later page of a keyword search
+    def all_topics(load, offset=0, search=None):
+        for topic in TOPICS:
+            load(start, end, topic, "content_english", 100, offset, search)
+
+    timed_repeat(queries, "topic_reviews_mongo", lambda: all_topics(lambda *a: load_topic_reviews(collection, TARGET, *a)), args.repeat)
+    timed_repeat(queries, "topic_search_mongo", lambda: all_topics(lambda *a: load_topic_reviews(collection, TARGET, *a), 200, "udah"), args.repeat)
+
+    # The Parquet backends, DuckDB only when it is installed
+    with tempfile.TemporaryDirectory() as root:
+        timed(queries, "parquet_export", lambda: backfill_export(collection, root))
+        for name in ["parquet", "duckdb"]:
+            try:
+                backend = make_backend(name, db, root)
+            except ImportError:
+                continue
+            timed_repeat(queries, f"daily_rows_{name}", lambda: backend.load_daily_rows(TARGET, first_day, last_day), args.repeat)
+            timed_repeat(queries, f"topic_reviews_{name}", lambda: all_topics(lambda *a: backend.load_topic_reviews(TARGET, *a)), args.repeat)
+            timed_repeat(queries, f"topic_search_{name}", lambda: all_topics(lambda *a: backend.load_topic_reviews(TARGET, *a), 200, "udah"), args.repeat)
+    return queries
+
+def run(args):
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ["command", "files"]},
+        "sizes": {}
+    }
+
+    for size in args.sizes:
+        print(f"Benchmarking {size:,} reviews")
+        start = time.perf_counter()
+        corpus = make_corpus(size, seed=args.seed)
+        result = {"corpus_seconds": round(time.perf_counter() - start, 6)}
+
+        db = make_database(args.mongodb_url)
+        result["ingest"] = bench_ingest(db, corpus, args)
+        result["dashboard"] = bench_dashboard(db, corpus, args)
+        result["refresh"] = bench_refresh(db, corpus, args)
+        result["near_duplicates"] = bench_near_duplicates(corpus, args)
+        if args.end_to_end:
+            result["end_to_end"] = bench_end_to_end(make_database(args.mongodb_url), corpus, args)
+        results["sizes"][str(size)] = result
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}")
+
+# Print how every timing moved between two result files
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for size, new_result in new["sizes"].items():
+        old_result = old["sizes"].get(size, {})
+        for group in ["ingest", "dashboard", "refresh", "end_to_end"]:
+            for name, timing in new_result.get(group, {}).items():
+                before = old_result.get(group, {}).get(name, {}).get("seconds")
+                after = timing["seconds"]
+                change = f"{after / before:.2f}x" if before else "new"
+                print(f"{size:>9} {group:<10} {name:<28} {before if before is not None else '-':>12} {after:>12} {change:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ingest stages and dashboard queries offline, against a synthetic corpus and fake Google Play, OpenAI and MongoDB.")
+    parser.add_argument("command", choices=["run", "compare"])
+    parser.add_argument("files", nargs="*", help="the old and new result files to compare")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000], help="corpus sizes, e.g. 10000 100000 1000000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results here instead of printing them")
+    parser.add_argument("--mongodb-url", help="use a local mongod instead of mongomock")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mean seconds per fake OpenAI request")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of fake OpenAI requests that fail with a rate limit error")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--llm-rpm", type=int, default=1_000_000)
+    parser.add_argument("--llm-tpm", type=int, default=1_000_000_000)
+    parser.add_argument("--llm-retry-delay", type=float, default=0.05, help="base backoff delay after a failed fake request")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=0.8, help="MinHash similarity at which two reviews share one enrichment")
+    parser.add_argument("--no-near-duplicates", action="store_true", help="enrich every text the exact cache misses")
+    parser.add_argument("--rollup-days-sample", type=int, default=10_000, help="newest reviews whose days update_rollups is timed on")
+    parser.add_argument("--refresh-edit-rate", type=float, default=0.02, help="share of the corpus edited or replied to before the refresh is timed")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every dashboard query, the median is reported")
+    parser.add_argument("--end-to-end", action="store_true", help="also time the overlapped streaming pipeline on a fresh database")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs the old and the new result file")
+        compare(*args.files)
+    else:
+        run(args)
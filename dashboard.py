@@ -1,14 +1,18 @@
 # Import libraries
 import os
-import numpy as np
 import pandas as pd
 from pymongo import MongoClient
-from google_play_scraper import app
 import datetime
 from dateutil.relativedelta import relativedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import streamlit as st
+from topics import TOPICS
+from dashboard_queries import DAY_COLUMNS, make_backend, to_stats, to_topic_counts
+from dashboard_cache import DayCache
+from mongo_schema import TIMESTAMP_PROJECTION, ensure_indexes
+from app_metadata import latest_snapshot, load_app_history
+from targets import load_targets, target_label
 
 # Change the page settings
 st.set_page_config(
@@ -38,10 +42,12 @@ st.markdown(hide_decoration_bar_style, unsafe_allow_html=True)
 # Create a connection to MongoDB
 @st.cache_resource
 def init_connection():
-    return MongoClient(
+    client = MongoClient(
         os.environ["MONGODB_URL"],
         serverSelectionTimeoutMS=300000
     )
+    ensure_indexes(client["vidio"], unique_review_id=False)
+    return client
 
 client = init_connection()
 
@@ -56,12 +62,12 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Insert timestamp
-@st.cache_data(ttl=600)
+# Insert timestamp, which also tells the caches below when new data has been ingested
+@st.cache_data(ttl=60)
 def load_timestamp():
     db = client["vidio"]
     collection = db["current_timestamp"]
-    doc = collection.find_one()
+    doc = collection.find_one({}, TIMESTAMP_PROJECTION)
     return doc["timestamp"]
 
 timestamp = load_timestamp()
@@ -71,6 +77,16 @@ st.markdown(f"<p style='text-align: center;'>Last updated on {timestamp}</p>", u
 st.markdown("<br>", unsafe_allow_html=True)
 lnk = '<link rel="stylesheet" href="https://use.fontawesome.com/releases/v5.12.1/css/all.css" crossorigin="anonymous">'
 
+# Pick the app and locale when more than one is scraped
+targets = load_targets()
+target = targets[0]
+if len(targets) > 1:
+    target = st.selectbox(
+        label="App and Locale",
+        options=targets,
+        format_func=target_label
+    )
+
 col1, col2, col3 = st.columns(3)
 with col1:
     period = st.selectbox(
@@ -122,31 +138,43 @@ st.markdown("""
     <ul>
         <li>This dashboard is still a work in progress and there will be frequent updates in the future.</li>
         <li>This dashboard is updated daily at around 9 AM local time in Asia/Jakarta.</li>
-        <li>The data shown on the dashboard is sourced from Indonesian reviews of the Vidio app on the Google Play Store, specifically from users located in Indonesia.</li>
+        <li>The data shown on the dashboard is sourced from Indonesian reviews of the Vidio app on the Google Play Store, specifically from users located in Indonesia. Other apps and locales can be picked with the <i>App and Locale</i> filter when they are tracked.</li>
         <li>By default, this dashboard displays data from the last 30 days when <i>day</i> is selected, from the last 12 weeks when <i>week</i> is selected, and from the last 6 months when <i>month</i> is selected.</li>
         <li>To view the full code for this dashboard, please visit this <a href="https://github.com/darren7753/vidio_google_play_store_reviews">GitHub Repository</a>.</li>
     </ul>
 """, unsafe_allow_html=True)
 
-# Load the data
-@st.cache_data(ttl=1)
-def load_data():
-    db = client["vidio"]
-    collection = db["google_play_store_reviews"]
-    query = {"at": {
-        "$gte": start_date_time,
-        "$lte": end_date_time + datetime.timedelta(days=1)
-    }}
-    return pd.DataFrame(list(collection.find(query)))
-
-df = load_data()
-df = df.drop_duplicates()
-df = df.drop("_id", axis=1)
-df = df.replace("empty", np.nan)
-df = df.sort_values("at", ascending=False)
-df["content_english"] = df["content_english"].str.replace("[", "", regex=False).str.replace("EN:", "", regex=False).str.replace("]", "", regex=False).str.replace('"', '', regex=False).str.strip()
-df = df.reset_index(drop=True)
-df.index += 1
+# Read from MongoDB, or from the Parquet export with DASHBOARD_BACKEND=parquet or duckdb
+@st.cache_resource
+def init_backend():
+    return make_backend(
+        os.environ.get("DASHBOARD_BACKEND", "mongo"),
+        client["vidio"],
+        os.environ.get("DASHBOARD_PARQUET_PATH", "reviews_parquet")
+    )
+
+# Load the data, keeping the days already fetched for each target until the next ingest
+@st.cache_resource
+def init_day_cache(target):
+    return DayCache(lambda first_day, last_day: init_backend().load_daily_rows(target, first_day, last_day), DAY_COLUMNS)
+
+@st.cache_data(max_entries=100)
+def load_reviews(target, start, end, topic, content_column, limit, offset, search, timestamp):
+    return init_backend().load_topic_reviews(target, start, end, topic, content_column, limit, offset, search)
+
+# Store listing numbers saved by the daily job, so the page never scrapes Google Play itself
+@st.cache_data(max_entries=10)
+def load_app_snapshot(target, timestamp):
+    return latest_snapshot(client["vidio"]["app_snapshots"], target)
+
+@st.cache_data(max_entries=100)
+def load_installs(target, start, end, timestamp):
+    return load_app_history(client["vidio"]["app_snapshots"], target, start, end)
+
+query_end_date_time = end_date_time + datetime.timedelta(days=1)
+df_days = init_day_cache(target).get(filter_start_date, query_end_date_time, timestamp)
+df_stats = to_stats(df_days, resample)
+topic_counts = to_topic_counts(df_days)
 
 # Create score cards
 col1, col2, col3 = st.columns(3)
@@ -157,7 +185,7 @@ with col1:
     fontsize = 50
     valign = "left"
     iconname = "fas fa-star"
-    i = round(df["score"].mean(), 2)
+    i = round(df_stats["score_sum"].sum() / df_stats["count"].sum(), 2)
 
     htmlstr = f"""
         <p style='background-color: rgb(
@@ -191,7 +219,7 @@ with col2:
     fontsize = 50
     valign = "left"
     iconname = "fas fa-comments"
-    i = f"{len(df):,}"
+    i = f"{df_stats['count'].sum():,}"
 
     htmlstr = f"""
         <p style='background-color: rgb(
@@ -225,7 +253,8 @@ with col3:
     fontsize = 50
     valign = "left"
     iconname = "fas fa-download"
-    i = app('com.vidio.android', lang="id", country="id")["installs"].replace(".", ",")
+    snapshot = load_app_snapshot(target, timestamp)
+    i = snapshot["installs"].replace(".", ",") if snapshot is not None and snapshot.get("installs") else "N/A"
 
     htmlstr = f"""
         <p style='background-color: rgb(
@@ -258,20 +287,10 @@ st.markdown(lnk + "<h2><i class='fas fa-chart-bar' style='font-size: 30px; color
 # Graphic showing number of reviews and average rating
 st.markdown("<h4>Number of Reviews and Average Rating</h4>", unsafe_allow_html=True)
 
-df_sliced = df.copy()
-df_sliced = df_sliced.set_index("at")
-
-def sentiment(x):
-    if x > 3:
-        return "Positive"
-    elif x == 3:
-        return "Neutral"
-    else:
-        return "Negative"
-df_sliced["sentiment"] = df_sliced["score"].apply(sentiment)
-
-df1 = df_sliced.resample(resample).agg({"score":"mean", "content_original":"count"}).fillna(0)
-df1.columns = ["mean", "count"]
+df1 = pd.DataFrame({
+    "mean": (df_stats["score_sum"] / df_stats["count"]).fillna(0),
+    "count": df_stats["count"]
+})
 df1["Count Growth"] = df1["count"].pct_change().fillna(0) * 100
 df1["Mean Growth"] = df1["mean"].pct_change().fillna(0) * 100
 
@@ -315,11 +334,7 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.markdown("<h4>Number of Reviews Based on Sentiment</h4>", unsafe_allow_html=True)
 
-    positive = df_sliced[df_sliced["sentiment"] == "Positive"][["sentiment"]].resample(resample).apply(lambda x: x.value_counts())
-    neutral = df_sliced[df_sliced["sentiment"] == "Neutral"][["sentiment"]].resample(resample).apply(lambda x: x.value_counts())
-    negative = df_sliced[df_sliced["sentiment"] == "Negative"][["sentiment"]].resample(resample).apply(lambda x: x.value_counts())
-
-    df2 = pd.concat([positive, neutral, negative], axis=1, ignore_index=True).fillna(0)
+    df2 = df_stats[["positive", "neutral", "negative"]].copy()
     df2.columns = ["Positive", "Neutral", "Negative"]
 
     df2["Positive Growth"] = df2["Positive"].pct_change().fillna(0) * 100
@@ -366,9 +381,9 @@ with col1:
 with col2:
     st.markdown("<h4>Percentages for Each Sentiment Category</h4>", unsafe_allow_html=True)
 
-    count_positive = len(df_sliced[df_sliced["sentiment"] == "Positive"])
-    count_neutral = len(df_sliced[df_sliced["sentiment"] == "Neutral"])
-    count_negative = len(df_sliced[df_sliced["sentiment"] == "Negative"])
+    count_positive = df_stats["positive"].sum()
+    count_neutral = df_stats["neutral"].sum()
+    count_negative = df_stats["negative"].sum()
 
     fig = go.Figure(go.Pie(
         labels=["Positive", "Neutral", "Negative"],
@@ -389,6 +404,32 @@ with col2:
     )
     st.plotly_chart(fig,use_container_width=True)
 
+# Graphic showing the installs growth from the daily app snapshots
+df3 = load_installs(target, start_date_time, end_date_time, timestamp)
+if len(df3) > 1:
+    st.markdown("<h4>Number of Installs</h4>", unsafe_allow_html=True)
+
+    df3["Installs Growth"] = df3["realInstalls"].diff().fillna(0)
+
+    fig = go.Figure(go.Scatter(
+        x=df3.index,
+        y=df3["realInstalls"],
+        mode="lines+markers",
+        name="Installs",
+        line=dict(color="#0088cc", width=2.5),
+        customdata=df3["Installs Growth"]
+    ))
+    fig.update_traces(
+        hovertemplate="Date: %{x|%b %d, %Y}<br>" + "Value: %{y:,}<br>" + "New Installs: %{customdata:,}"
+    )
+    fig.update_layout(
+        plot_bgcolor="rgba(0, 0, 0, 0)",
+        paper_bgcolor="rgba(0, 0, 0, 0)",
+        height=350,
+        margin={"r":0, "l":0, "t":0, "b":0},
+    )
+    st.plotly_chart(fig,use_container_width=True)
+
 # Topic Modeling
 st.markdown(lnk + "<h2><i class='fas fa-pen' style='font-size: 30px; color: #ed203f;'></i>&nbsp;Topic Modeling (Work in Progress)</h2>", unsafe_allow_html=True)
 
@@ -410,65 +451,42 @@ with col1:
     else:
         content_column = "content_english"
 
-df_topic_1 = df_sliced[df_sliced["topic"] == "Advertisement"][[content_column, "score"]]
-df_topic_2 = df_sliced[df_sliced["topic"] == "Watching Experience"][[content_column, "score"]]
-df_topic_3 = df_sliced[df_sliced["topic"] == "Package"][[content_column, "score"]]
-df_topic_4 = df_sliced[df_sliced["topic"] == "Technical"][[content_column, "score"]]
-df_topic_5 = df_sliced[df_sliced["topic"] == "Network"][[content_column, "score"]]
-df_topic_6 = df_sliced[df_sliced["topic"] == "Others"][[content_column, "score"]]
+total_topics = topic_counts.sum()
 
 with col2:
-    st.write("Slide to choose the number of rows to display.")
-
-    if max([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4)]) < 100:
-        slider_value = max([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4)])
-    else:
-        slider_value = 100
+    st.write("Slide to choose the number of rows to display on each page.")
 
     n_rows = st.slider(
         label="label",
-        min_value=1,
-        max_value=max([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4)]),
-        value=slider_value,
+        min_value=10,
+        max_value=100,
+        value=25,
+        step=5,
         label_visibility="collapsed"
     )
 
-col1, col2 = st.columns(2)
-with col1:
-    pct = len(df_topic_1) / sum([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4), len(df_topic_5), len(df_topic_6)]) * 100
-    st.markdown(f"<h4>Advertisement ({round(pct, 2)}%)</h4>", unsafe_allow_html=True)
-    with st.expander("View more details"):
-        st.dataframe(df_topic_1.head(n_rows), use_container_width=True)
-with col2:
-    pct = len(df_topic_2) / sum([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4), len(df_topic_5), len(df_topic_6)]) * 100
-    st.markdown(f"<h4>Watching Experience ({round(pct, 2)}%)</h4>", unsafe_allow_html=True)
-    with st.expander("View more details"):
-        st.dataframe(df_topic_2.head(n_rows), use_container_width=True)
-
-col1, col2 = st.columns(2)
-with col1:
-    pct = len(df_topic_3) / sum([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4), len(df_topic_5), len(df_topic_6)]) * 100
-    st.markdown(f"<h4>Package ({round(pct, 2)}%)</h4>", unsafe_allow_html=True)
-    with st.expander("View more details"):
-        st.dataframe(df_topic_3.head(n_rows), use_container_width=True)
-with col2:
-    pct = len(df_topic_4) / sum([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4), len(df_topic_5), len(df_topic_6)]) * 100
-    st.markdown(f"<h4>Technical ({round(pct, 2)}%)</h4>", unsafe_allow_html=True)
-    with st.expander("View more details"):
-        st.dataframe(df_topic_4.head(n_rows), use_container_width=True)
+search = st.text_input("Search the reviews of every topic for a keyword.").strip()
+
+for i in range(0, len(TOPICS), 2):
+    for col, topic in zip(st.columns(2), TOPICS[i:i + 2]):
+        with col:
+            pct = topic_counts[topic] / total_topics * 100
+            st.markdown(f"<h4>{topic} ({round(pct, 2)}%)</h4>", unsafe_allow_html=True)
+            with st.expander("View more details"):
+                # Only fetch the raw reviews once they are asked for, one page at a time
+                if st.checkbox("Load reviews", key=f"load_{topic}"):
+                    # The number of pages is only known without a keyword, since the counts come from the rollups
+                    n_pages = max(-(-int(topic_counts[topic]) // n_rows), 1) if not search else None
+                    # A narrower window can leave fewer pages than the one last viewed
+                    if n_pages is not None and st.session_state.get(f"page_{topic}", 1) > n_pages:
+                        st.session_state[f"page_{topic}"] = n_pages
+                    page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, key=f"page_{topic}")
+                    df_page = load_reviews(target, start_date_time, query_end_date_time, topic, content_column, n_rows, (page - 1) * n_rows, search, timestamp)
+                    if len(df_page) > 0:
+                        st.dataframe(df_page, use_container_width=True)
+                    else:
+                        st.write("No reviews found on this page.")
 
-col1, col2 = st.columns(2)
-with col1:
-    pct = len(df_topic_5) / sum([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4), len(df_topic_5), len(df_topic_6)]) * 100
-    st.markdown(f"<h4>Network ({round(pct, 2)}%)</h4>", unsafe_allow_html=True)
-    with st.expander("View more details"):
-        st.dataframe(df_topic_5.head(n_rows), use_container_width=True)
-with col2:
-    pct = len(df_topic_6) / sum([len(df_topic_1), len(df_topic_2), len(df_topic_3), len(df_topic_4), len(df_topic_5), len(df_topic_6)]) * 100
-    st.markdown(f"<h4>Others ({round(pct, 2)}%)</h4>", unsafe_allow_html=True)
-    with st.expander("View more details"):
-        st.dataframe(df_topic_6.head(n_rows), use_container_width=True)
-    
 # Write credit
 st.markdown(lnk + """
     <br>
@@ -0,0 +1,58 @@
+# Import libraries
+import threading
+import pandas as pd
+
+from collections import OrderedDict
+
+# In-process LRU store of daily rows that only fetches the days it has not seen yet
+class DayCache:
+    def __init__(self, fetch, columns, max_days=1_000):
+        self.fetch = fetch
+        self.columns = columns
+        self.max_days = max_days
+        self.days = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Group the missing days into contiguous (first, last) ranges
+    def missing_ranges(self, days):
+        ranges = []
+        for day in days:
+            if day in self.days:
+                continue
+            if len(ranges) > 0 and ranges[-1][1] == day - pd.Timedelta(days=1):
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        return ranges
+
+    # Daily rows between first_day and last_day, dropped whenever `version` changes
+    def get(self, first_day, last_day, version):
+        days = pd.date_range(pd.Timestamp(first_day).normalize(), pd.Timestamp(last_day).normalize(), freq="D")
+
+        with self.lock:
+            if version != self.version:
+                self.days.clear()
+                self.version = version
+
+            missing = 0
+            for first, last in self.missing_ranges(days):
+                fetched = self.fetch(first, last)
+                for day in pd.date_range(first, last, freq="D"):
+                    # Days without reviews are kept as zeros so they are not fetched again
+                    self.days[day] = tuple(fetched.loc[day, self.columns]) if day in fetched.index else (0,) * len(self.columns)
+                    missing += 1
+            self.misses += missing
+            self.hits += len(days) - missing
+
+            rows = []
+            for day in days:
+                self.days.move_to_end(day)
+                rows.append(self.days[day])
+
+            while len(self.days) > self.max_days:
+                self.days.popitem(last=False)
+
+        return pd.DataFrame(rows, index=days, columns=self.columns)
@@ -0,0 +1,183 @@
+# Import libraries
+import os
+import re
+import pandas as pd
+
+from datetime import timedelta
+from rollups import daily_rollup_pipeline, to_rollup
+from topics import TOPICS
+from mongo_schema import topic_review_projection
+from review_schema import apply_dtypes
+from targets import TARGET_FIELDS, target_match
+
+# Per-day statistics kept in the daily rollups
+STAT_COLUMNS = ["count", "score_sum", "positive", "neutral", "negative"]
+DAY_COLUMNS = [*STAT_COLUMNS, *TOPICS]
+
+# Statistics and topic counts of one target for every day between first_day and last_day, inclusive
+def load_daily_rows(db, target, first_day, last_day):
+    first_day = pd.Timestamp(first_day).to_pydatetime()
+    last_day = pd.Timestamp(last_day).to_pydatetime()
+
+    # Aggregate the raw reviews until the target's rollups are backfilled
+    if db["daily_rollups"].find_one(target_match(target), {"_id": 1}) is not None:
+        docs = db["daily_rollups"].find({**target_match(target), "day": {"$gte": first_day, "$lte": last_day}})
+    else:
+        match = {**target_match(target), "at": {"$gte": first_day, "$lt": last_day + timedelta(days=1)}}
+        docs = (to_rollup(doc) for doc in db["google_play_store_reviews"].aggregate(daily_rollup_pipeline(match)))
+
+    rows = [{"at": doc["day"], **{column: doc[column] for column in STAT_COLUMNS}, **doc["topics"]} for doc in docs]
+    df = pd.DataFrame(rows, columns=["at", *DAY_COLUMNS]).fillna(0).astype({column: "int32" for column in DAY_COLUMNS})
+    df["at"] = pd.to_datetime(df["at"])
+    return df.set_index("at").sort_index()
+
+# Re-bucket daily rows into days, weeks or months
+def to_stats(df_days, resample):
+    df = df_days.loc[df_days["count"] > 0, STAT_COLUMNS]
+    if len(df) == 0:
+        return df
+    return df.resample(resample).sum()
+
+def to_topic_counts(df_days):
+    return df_days[TOPICS].sum().astype("int64")
+
+def empty_reviews(columns):
+    return pd.DataFrame({column: pd.Series(dtype="datetime64[ns]" if column == "at" else "object") for column in columns})
+
+# Same per-day rows as the rollups, computed from raw reviews read from Parquet
+def daily_rows_from_reviews(df):
+    rows = pd.DataFrame({
+        "count": 1,
+        "score_sum": df["score"].astype("int64"),
+        "positive": df["score"] > 3,
+        "neutral": df["score"] == 3,
+        "negative": df["score"] < 3,
+        **{topic: df["topic"] == topic for topic in TOPICS}
+    }, index=df.index).groupby(df["at"].dt.normalize().rename("at")).sum()
+    return rows.reindex(columns=DAY_COLUMNS).astype("int32").sort_index()
+
+def clean_english(series):
+    return series.astype("string").str.replace("[", "", regex=False).str.replace("EN:", "", regex=False).str.replace("]", "", regex=False).str.replace('"', '', regex=False).str.strip()
+
+# One page of the newest raw reviews of a target and topic, walked along the (target, topic, at) index and only fetched when a table is shown
+def load_topic_reviews(collection, target, start, end, topic, content_column, limit, offset=0, search=None):
+    match = {**target_match(target), "topic": topic, "at": {"$gte": start, "$lte": end}}
+    if search:
+        match[content_column] = {"$regex": re.escape(search), "$options": "i"}
+    docs = collection.find(match, topic_review_projection(content_column)).sort("at", -1).skip(offset).limit(limit)
+    return to_topic_table(pd.DataFrame(list(docs), columns=[content_column, "score"]), content_column, offset)
+
+# Rows are numbered from the first review of the page
+def to_topic_table(df, content_column, offset=0):
+    df = apply_dtypes(df[[content_column, "score"]].reset_index(drop=True))
+    if content_column == "content_english":
+        df[content_column] = clean_english(df[content_column])
+    df.index += offset + 1
+    return df
+
+# Where the dashboard reads its data from, picked with the DASHBOARD_BACKEND environment variable
+class MongoBackend:
+    def __init__(self, db):
+        self.db = db
+
+    def load_daily_rows(self, target, first_day, last_day):
+        return load_daily_rows(self.db, target, first_day, last_day)
+
+    def load_topic_reviews(self, target, start, end, topic, content_column, limit, offset=0, search=None):
+        return load_topic_reviews(self.db["google_play_store_reviews"], target, start, end, topic, content_column, limit, offset, search)
+
+# Date-partitioned Parquet files written by parquet_export.py, read with pyarrow
+class ParquetBackend:
+    def __init__(self, root):
+        self.root = root
+
+    # Prune the day partitions first, then push the target and `at` bounds down into the row groups
+    def read(self, target, start, end, columns, condition=None):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        if not os.path.isdir(self.root):
+            return empty_reviews(columns)
+
+        dataset = ds.dataset(self.root, format="parquet", partitioning=ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive"))
+        bounds = (
+            (ds.field("day") >= f"{start:%Y-%m-%d}") & (ds.field("day") <= f"{end:%Y-%m-%d}")
+            & (ds.field("at") >= pa.scalar(start.to_datetime64(), pa.timestamp("ns")))
+            & (ds.field("at") <= pa.scalar(end.to_datetime64(), pa.timestamp("ns")))
+        )
+        for field in TARGET_FIELDS:
+            bounds = bounds & (ds.field(field) == target[field])
+        if condition is not None:
+            bounds = bounds & condition
+        return dataset.to_table(columns=columns, filter=bounds).to_pandas()
+
+    def load_daily_rows(self, target, first_day, last_day):
+        last = pd.Timestamp(last_day) + timedelta(days=1) - pd.Timedelta(1, "ns")
+        return daily_rows_from_reviews(self.read(target, first_day, last, ["at", "score", "topic"]))
+
+    def load_topic_reviews(self, target, start, end, topic, content_column, limit, offset=0, search=None):
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        condition = ds.field("topic") == topic
+        if search:
+            condition = condition & pc.match_substring(ds.field(content_column), search, ignore_case=True)
+        df = self.read(target, start, end, ["at", content_column, "score"], condition)
+        return to_topic_table(df.sort_values("at", ascending=False).iloc[offset:offset + limit], content_column, offset)
+
+# The same Parquet files queried with DuckDB, which also aggregates the days itself
+class DuckDBBackend:
+    def __init__(self, root):
+        import duckdb
+
+        self.root = root
+        self.connection = duckdb.connect()
+
+    def query(self, select, where, params):
+        files = os.path.join(self.root, "day=*", "*.parquet")
+        sql = f"SELECT {select} FROM read_parquet('{files}', hive_partitioning = true) WHERE CAST(day AS VARCHAR) BETWEEN ? AND ? AND \"at\" BETWEEN ? AND ? AND app_id = ? AND lang = ? AND country = ? {where}"
+        return self.connection.cursor().execute(sql, params).df()
+
+    def bounds(self, target, start, end):
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        return [f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}", start.to_pydatetime(), end.to_pydatetime(), *[target[field] for field in TARGET_FIELDS]]
+
+    def load_daily_rows(self, target, first_day, last_day):
+        if not os.path.isdir(self.root):
+            return daily_rows_from_reviews(empty_reviews(["at", "score", "topic"]))
+
+        last = pd.Timestamp(last_day) + timedelta(days=1) - pd.Timedelta(1, "us")
+        select = ", ".join([
+            "date_trunc('day', \"at\") AS \"at\"",
+            "count(*) AS count",
+            "sum(score) AS score_sum",
+            "count_if(score > 3) AS positive",
+            "count_if(score = 3) AS neutral",
+            "count_if(score < 3) AS negative",
+            *[f"count_if(topic = '{topic}') AS \"{topic}\"" for topic in TOPICS]
+        ])
+        df = self.query(select, "GROUP BY 1", self.bounds(target, first_day, last))
+        df["at"] = pd.to_datetime(df["at"])
+        return df.set_index("at").reindex(columns=DAY_COLUMNS).astype("int32").sort_index()
+
+    def load_topic_reviews(self, target, start, end, topic, content_column, limit, offset=0, search=None):
+        if not os.path.isdir(self.root):
+            return to_topic_table(empty_reviews([content_column, "score"]), content_column, offset)
+
+        where = "AND topic = ?"
+        params = [*self.bounds(target, start, end), topic]
+        if search:
+            where += f" AND {content_column} ILIKE ? ESCAPE '\\'"
+            params.append("%" + re.sub(r"([%_\\])", r"\\\1", search) + "%")
+        df = self.query(f"{content_column}, score", where + ' ORDER BY "at" DESC LIMIT ? OFFSET ?', [*params, limit, offset])
+        return to_topic_table(df, content_column, offset)
+
+def make_backend(name, db, parquet_path):
+    if name == "parquet":
+        return ParquetBackend(parquet_path)
+    if name == "duckdb":
+        return DuckDBBackend(parquet_path)
+    return MongoBackend(db)
@@ -0,0 +1,51 @@
+# Import libraries
+import numpy as np
+import pandas as pd
+
+from mongo_schema import REVIEW_ID_PROJECTION
+
+# 64-bit hashes of the reviewIds, computed in one vectorized call
+def hash_ids(ids):
+    return pd.util.hash_array(np.asarray(list(ids), dtype=object))
+
+# Sorted array of reviewId hashes, 8 bytes per stored review
+class ReviewIdIndex:
+    def __init__(self, hashes):
+        self.hashes = np.unique(np.asarray(hashes, dtype=np.uint64))
+        self.added = np.empty(0, dtype=np.uint64)
+
+    # Read every reviewId straight from the reviewId index without touching the documents
+    @classmethod
+    def load(cls, collection, batch_size=50_000):
+        cursor = collection.find({}, REVIEW_ID_PROJECTION, batch_size=batch_size).hint("reviewId_1")
+
+        chunks = []
+        ids = []
+        for doc in cursor:
+            ids.append(doc.get("reviewId"))
+            if len(ids) == batch_size:
+                chunks.append(hash_ids(ids))
+                ids = []
+        if len(ids) > 0:
+            chunks.append(hash_ids(ids))
+        return cls(np.concatenate(chunks) if len(chunks) > 0 else [])
+
+    def __len__(self):
+        return len(self.hashes) + len(self.added)
+
+    def contains(self, ids):
+        hashes = hash_ids(ids)
+        if len(self.hashes) == 0:
+            return np.isin(hashes, self.added)
+
+        positions = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        return (self.hashes[positions] == hashes) | np.isin(hashes, self.added)
+
+    # Remember reviews stored during this run
+    def add(self, ids):
+        self.added = np.union1d(self.added, hash_ids(ids))
+
+# Split a page into the reviews not stored yet and the number already seen
+def split_new(index, page):
+    seen = index.contains(page["reviewId"])
+    return page[~seen], int(seen.sum())
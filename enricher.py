@@ -0,0 +1,86 @@
+# Import libraries
+import os
+import threading
+import openai
+
+from llm_client import LLMClient
+from enrichment import PROMPT_VERSION, TranslationRepair, enrich_reviews, topic_prompt, translation_prompt, with_fallbacks
+from enrichment_cache import MongoEnrichmentCache, SQLiteEnrichmentCache
+from topic_classifier import MODEL_PATH, TopicClassifier
+from near_duplicates import NearDuplicateIndex
+
+# Translation and topic labeling of negative reviews shared by the daily job and the backfill, configured from the environment
+# (`budget` holds the RPM/TPM buckets and the concurrency the scheduler shares between its processes)
+class Enricher:
+    def __init__(self, db, stats=None, model="gpt-3.5-turbo", budget=None):
+        budget = budget or {}
+
+        # Create a concurrent OpenAI client
+        openai.api_key = os.environ["OPENAI_API_KEY"]
+        self.llm = LLMClient(
+            model=model,
+            max_concurrency=budget.get("max_concurrency", int(os.environ.get("OPENAI_MAX_CONCURRENCY", 8))),
+            rpm=int(os.environ.get("OPENAI_RPM", 3_500)),
+            tpm=int(os.environ.get("OPENAI_TPM", 90_000)),
+            stats=stats,
+            requests=budget.get("requests"),
+            tokens=budget.get("tokens")
+        )
+
+        # Translate and label reviews, repairing any translation in the wrong format
+        self.repair = TranslationRepair(
+            self.translate_to_english,
+            max_attempts=int(os.environ.get("REPAIR_MAX_ATTEMPTS", 3)),
+            max_requests=int(os.environ.get("REPAIR_MAX_REQUESTS", 500))
+        )
+
+        # Label confident reviews with the local topic classifier when a trained model is available
+        classifier_path = os.environ.get("TOPIC_CLASSIFIER_PATH", MODEL_PATH)
+        self.classifier = None
+        if os.path.exists(classifier_path):
+            self.classifier = TopicClassifier.load(classifier_path, threshold=float(os.environ.get("TOPIC_CLASSIFIER_THRESHOLD", 0.8)))
+
+        # Reuse earlier results for review texts that were already enriched
+        cache_version = f"{self.llm.model}:{PROMPT_VERSION}"
+        if "ENRICHMENT_CACHE_PATH" in os.environ:
+            self.cache = SQLiteEnrichmentCache(os.environ["ENRICHMENT_CACHE_PATH"], cache_version)
+        else:
+            self.cache = MongoEnrichmentCache(db["enrichment_cache"], cache_version)
+
+        # Enrich only one review per cluster of near-duplicate texts the cache has not seen
+        self.near_duplicates = NearDuplicateIndex(threshold=float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0.8)))
+
+        # The classifier is shared by the backfill workers, so they take turns on it
+        self.lock = threading.Lock()
+
+    # Translate reviews from Indonesian to English
+    def translate_to_english(self, texts):
+        return self.llm.map([translation_prompt(text) for text in texts], default=None, prompt_type="translation")
+
+    # Apply topic modeling
+    def assign_topic(self, texts):
+        return self.llm.map([topic_prompt(text) for text in texts], default=None, prompt_type="topic")
+
+    def enrich_texts(self, texts):
+        with self.lock:
+            known_topics = self.classifier.predict(texts) if self.classifier is not None else None
+        english, topics = enrich_reviews(self.llm, texts, self.translate_to_english, self.assign_topic, known_topics)
+        return self.repair.run(texts, english), topics
+
+    # Failed results reach the cache and the near-duplicate index as None, which neither keeps, and only then get their fallbacks
+    def enrich(self, texts):
+        return with_fallbacks(*self.cache.enrich(texts, lambda missing: self.near_duplicates.enrich(missing, self.enrich_texts)))
+
+    def reports(self):
+        reports = [self.cache.report(), self.near_duplicates.report(), self.repair.report()]
+        if self.classifier is not None:
+            reports.append(self.classifier.report())
+        return reports
+
+    # Counters kept with the run record
+    def to_doc(self):
+        return {
+            "cache": {"hits": self.cache.hits, "misses": self.cache.misses, "requested": self.cache.requested},
+            "near_duplicates": {"texts": self.near_duplicates.texts, "clusters": len(self.near_duplicates.members), "saved": self.near_duplicates.texts - len(self.near_duplicates.members)},
+            "repair": {"first_pass": self.repair.first_pass, "repaired": self.repair.repaired, "given_up": self.repair.given_up, "requests": self.repair.requests}
+        }
@@ -0,0 +1,174 @@
+# Import libraries
+import json
+import re
+import threading
+
+from topics import TOPICS, normalize_topic
+
+# Bump whenever the prompts change so cached results are not reused
+PROMPT_VERSION = "1"
+
+# Number of reviews packed into one enrichment request
+BATCH_SIZE = 25
+
+TRANSLATION_PATTERN = re.compile(r'^\[EN: [^\[\]]+\]$')
+
+# What a review is stored with when its request failed or its repair gave up; failures stay None until then so they are never cached
+FALLBACK_TRANSLATION = "[EN: Cannot be translated]"
+FALLBACK_TOPIC = "[Topic: Others]"
+
+def with_fallbacks(english, topics):
+    return [FALLBACK_TRANSLATION if text is None else text for text in english], [FALLBACK_TOPIC if topic is None else topic for topic in topics]
+
+def find_invalid_indices(english):
+    invalid_indices = []
+    for i, text in enumerate(english):
+        if text is None or not TRANSLATION_PATTERN.match(text):
+            invalid_indices.append(i)
+    return invalid_indices
+
+# Translate one review from Indonesian to English
+def translation_prompt(text):
+    return f'Please translate this Indonesian text "{text}" to english in the format [EN: translation], but if there is no English translation, return [EN: Cannot be translated]. Please make sure write in the format that I requested only.'
+
+# Assign one review to a topic
+def topic_prompt(text):
+    return f'Please assign one of the topics ({", ".join(TOPICS)}) to this text "{text}" in the format [Topic: assigned topic]. Please make sure write in the format that I requested only.'
+
+# Ask for the translation, and optionally the topic, of many reviews in one request
+def enrichment_prompt(texts, with_topic=True):
+    items = json.dumps([{"id": str(i), "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+    if with_topic:
+        return f'Please translate each of these Indonesian reviews to english and assign one of the topics ({", ".join(TOPICS)}) to each of them. If a review has no English translation, use "Cannot be translated" as its translation. Reply in JSON only, in the format {{"items": [{{"id": review id, "english": translation, "topic": assigned topic}}]}}. Reviews: {items}'
+    return f'Please translate each of these Indonesian reviews to english. If a review has no English translation, use "Cannot be translated" as its translation. Reply in JSON only, in the format {{"items": [{{"id": review id, "english": translation}}]}}. Reviews: {items}'
+
+# Map a batch response back to its reviews, in the same [EN: ...] / [Topic: ...] format as the single prompts
+def parse_enrichment(response, n_items):
+    english = [None] * n_items
+    topics = [None] * n_items
+
+    try:
+        items = json.loads(response[response.index("{"):response.rindex("}") + 1])["items"]
+    except (ValueError, KeyError, TypeError):
+        return english, topics
+
+    for item in items:
+        try:
+            idx = int(item["id"])
+            translated_text = f'[EN: {str(item["english"]).strip()}]'
+        except (ValueError, KeyError, TypeError):
+            continue
+
+        if 0 <= idx < n_items:
+            if TRANSLATION_PATTERN.match(translated_text):
+                english[idx] = translated_text
+            labeled_topic = normalize_topic(item.get("topic"))
+            if labeled_topic is not None:
+                topics[idx] = f'[Topic: {labeled_topic}]'
+    return english, topics
+
+# Enrich the reviews in batches, retrying anything a batch left out on its own
+def enrich_reviews(llm, texts, translate_to_english, assign_topic, known_topics=None, batch_size=BATCH_SIZE):
+    texts = list(texts)
+    english = [None] * len(texts)
+    topics = list(known_topics) if known_topics is not None else [None] * len(texts)
+
+    # Reviews that already have a topic only need a translation
+    batches = []
+    for with_topic in [True, False]:
+        indices = [i for i, topic in enumerate(topics) if (topic is None) == with_topic]
+        batches += [(indices[i:i + batch_size], with_topic) for i in range(0, len(indices), batch_size)]
+    responses = llm.map([enrichment_prompt([texts[i] for i in batch], with_topic) for batch, with_topic in batches], default="", prompt_type="batch")
+
+    for (batch, with_topic), response in zip(batches, responses):
+        batch_english, batch_topics = parse_enrichment(response, len(batch))
+        for i, translated_text, labeled_topic in zip(batch, batch_english, batch_topics):
+            english[i] = translated_text
+            if with_topic:
+                topics[i] = labeled_topic
+
+    missing_english = [i for i, text in enumerate(english) if text is None]
+    for i, text in zip(missing_english, translate_to_english([texts[i] for i in missing_english])):
+        english[i] = text
+
+    missing_topics = [i for i, text in enumerate(topics) if text is None]
+    for i, text in zip(missing_topics, assign_topic([texts[i] for i in missing_topics])):
+        topics[i] = text
+
+    return english, topics
+
+# Near-miss answers like "EN: text", "[EN: text" or "Translation: text"
+NEAR_MISS_PATTERN = re.compile(r'^\W*(?:EN|English|Translation)\s*:\s*(.+?)[\s\]"\']*$', re.IGNORECASE | re.DOTALL)
+
+# Pull the translation out of a near-miss answer without another request
+def extract_translation(text):
+    match = NEAR_MISS_PATTERN.match(str(text).strip())
+    if match is None:
+        return None
+
+    translation = re.sub(r'[\[\]]', '', match.group(1)).strip().strip('"\'').strip()
+    if len(translation) == 0:
+        return None
+    return f'[EN: {translation}]'
+
+# Repair translations in the wrong format within a per-item and a per-run request budget
+class TranslationRepair:
+    def __init__(self, translate_to_english, max_attempts=3, max_requests=500):
+        self.translate_to_english = translate_to_english
+        self.max_attempts = max_attempts
+        self.max_requests = max_requests
+        self.requests = 0
+        self.first_pass = 0
+        self.repaired = 0
+        self.given_up = 0
+        # Backfill workers repair at the same time, so only the counters and the request budget are taken in turn
+        self.lock = threading.Lock()
+
+    def run(self, texts, english):
+        texts = list(texts)
+        english = list(english)
+        invalid = find_invalid_indices(english)
+        with self.lock:
+            self.first_pass += len(english) - len(invalid)
+
+        # Failed requests were already retried by the LLM client, only answers in the wrong format are repaired
+        pending = [i for i in invalid if english[i] is not None]
+
+        attempts = 0
+        while True:
+            still_invalid = []
+            for i in pending:
+                if english[i] is None:
+                    salvaged = None
+                else:
+                    salvaged = english[i] if TRANSLATION_PATTERN.match(english[i]) else extract_translation(english[i])
+                if salvaged is None:
+                    still_invalid.append(i)
+                else:
+                    english[i] = salvaged
+            with self.lock:
+                self.repaired += len(pending) - len(still_invalid)
+            pending = still_invalid
+
+            if attempts == self.max_attempts:
+                break
+            with self.lock:
+                allowed = pending[:max(0, self.max_requests - self.requests)]
+                self.requests += len(allowed)
+            if len(allowed) == 0:
+                break
+
+            # Re-request the remaining items concurrently
+            attempts += 1
+            for i, text in zip(allowed, self.translate_to_english([texts[i] for i in allowed])):
+                english[i] = text
+
+        # Given up translations are left None, so the caller can tell them from a real "Cannot be translated"
+        for i in pending:
+            english[i] = None
+        with self.lock:
+            self.given_up += len(pending)
+        return english
+
+    def report(self):
+        return f"Translation repair: {self.first_pass} valid on first pass, {self.repaired} repaired, {self.given_up} given up, {self.requests} repair requests"
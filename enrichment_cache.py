@@ -0,0 +1,111 @@
+# Import libraries
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+# Cache of enrichment results keyed by review text and prompt/model version
+class EnrichmentCache:
+    def __init__(self, version, ttl_days=90):
+        self.version = version
+        self.ttl = timedelta(days=ttl_days)
+        self.hits = 0
+        self.misses = 0
+        self.requested = 0
+        # Backfill workers share the cache, so they take turns on the counters
+        self.lock = threading.Lock()
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.version}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    # Serve what is cached and send each distinct missing text to `enrich` only once
+    def enrich(self, texts, enrich):
+        texts = list(texts)
+        keys = [self.key(text) for text in texts]
+        found = self.get_many(set(keys))
+
+        missing = {}
+        n_misses = 0
+        for key, text in zip(keys, texts):
+            if key not in found:
+                n_misses += 1
+                missing.setdefault(key, text)
+        with self.lock:
+            self.hits += len(keys) - n_misses
+            self.misses += n_misses
+            self.requested += len(missing)
+
+        if len(missing) > 0:
+            english, topics = enrich(list(missing.values()))
+            computed = dict(zip(missing.keys(), zip(english, topics)))
+            # Failed requests come back as None and are left out, so the next run asks again
+            succeeded = {key: result for key, result in computed.items() if None not in result}
+            if len(succeeded) > 0:
+                self.set_many(succeeded)
+            found.update(computed)
+
+        return [found[key][0] for key in keys], [found[key][1] for key in keys]
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0
+
+    def report(self):
+        return f"Enrichment cache: {self.hits} hits, {self.misses} misses ({self.hit_rate():.1%} hit rate), {self.requested} texts passed on for enrichment"
+
+# Cache stored in a MongoDB collection, expired by a TTL index
+class MongoEnrichmentCache(EnrichmentCache):
+    def __init__(self, collection, version, ttl_days=90):
+        super().__init__(version, ttl_days)
+        self.collection = collection
+        self.collection.create_index("created_at", expireAfterSeconds=int(self.ttl.total_seconds()))
+
+    def get_many(self, keys):
+        docs = self.collection.find({"_id": {"$in": list(keys)}, "version": self.version})
+        return {doc["_id"]: (doc["english"], doc["topic"]) for doc in docs}
+
+    def set_many(self, entries):
+        created_at = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne(
+                {"_id": key},
+                {"$set": {"english": english, "topic": topic, "version": self.version, "created_at": created_at}},
+                upsert=True
+            )
+            for key, (english, topic) in entries.items()
+        ], ordered=False)
+
+# Local SQLite stand-in for testing without MongoDB
+class SQLiteEnrichmentCache(EnrichmentCache):
+    def __init__(self, path, version, ttl_days=90):
+        super().__init__(version, ttl_days)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS enrichment_cache (key TEXT PRIMARY KEY, english TEXT, topic TEXT, version TEXT, created_at REAL)")
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        oldest = time.time() - self.ttl.total_seconds()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.connection.execute(
+                f"SELECT key, english, topic FROM enrichment_cache WHERE key IN ({','.join('?' * len(chunk))}) AND version = ? AND created_at >= ?",
+                [*chunk, self.version, oldest]
+            )
+            found.update({key: (english, topic) for key, english, topic in rows})
+        return found
+
+    def set_many(self, entries):
+        created_at = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO enrichment_cache VALUES (?, ?, ?, ?, ?)",
+                [(key, english, topic, self.version, created_at) for key, (english, topic) in entries.items()]
+            )
@@ -0,0 +1,141 @@
+# Import libraries
+import asyncio
+import multiprocessing
+import random
+import threading
+import time
+import openai
+
+# Errors worth retrying, anything else fails the request straight away
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.TryAgain
+)
+
+# Token bucket refilled continuously at `per_minute` units per minute, shared by every thread's event loop
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+# Token bucket kept in shared memory, so every process of the scheduler draws on the same per-minute budget
+class SharedTokenBucket:
+    def __init__(self, per_minute, context=None):
+        context = context or multiprocessing.get_context()
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = context.Value("d", per_minute, lock=False)
+        self.updated = context.Value("d", time.monotonic(), lock=False)
+        self.lock = context.Lock()
+
+    # Take `amount` if it is there and return 0, otherwise return how long to wait for it
+    def take(self, amount=1):
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens.value = min(self.capacity, self.tokens.value + (now - self.updated.value) * self.rate)
+            self.updated.value = now
+            if self.tokens.value >= amount:
+                self.tokens.value -= amount
+                return 0
+            return (amount - self.tokens.value) / self.rate
+
+    async def acquire(self, amount=1):
+        wait = self.take(amount)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.take(amount)
+
+    # Blocking version, used to space out the Google Play requests
+    def wait(self, amount=1):
+        wait = self.take(amount)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.take(amount)
+
+# Concurrent chat completion client with RPM/TPM limits and backoff
+class LLMClient:
+    # `requests` and `tokens` replace the RPM and TPM buckets, to share them with other processes
+    def __init__(self, model="gpt-3.5-turbo", max_concurrency=8, rpm=3_500, tpm=90_000, max_retries=5, base_delay=1, max_delay=60, request_timeout=60, stats=None, requests=None, tokens=None):
+        self.model = model
+        self.stats = stats
+        self.max_concurrency = max_concurrency
+        self.requests = requests if requests is not None else TokenBucket(rpm)
+        self.tokens = tokens if tokens is not None else TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_timeout = request_timeout
+
+    # Rough token count used to reserve TPM quota before sending a prompt
+    def estimate_tokens(self, prompt):
+        return len(prompt) // 4 + 100
+
+    async def complete(self, prompt, semaphore, prompt_type="prompt"):
+        start = time.perf_counter()
+        usage = None
+        attempt = 0
+        try:
+            for attempt in range(self.max_retries):
+                await self.requests.acquire()
+                await self.tokens.acquire(self.estimate_tokens(prompt))
+                try:
+                    async with semaphore:
+                        response = await openai.ChatCompletion.acreate(
+                            model=self.model,
+                            messages=[{"role": "user", "content": prompt}],
+                            request_timeout=self.request_timeout
+                        )
+                    usage = response.get("usage", {})
+                    return response["choices"][0]["message"]["content"]
+                except RETRYABLE_ERRORS:
+                    if attempt == self.max_retries - 1:
+                        raise
+
+                    # Exponential backoff with full jitter
+                    await asyncio.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+        finally:
+            if self.stats is not None:
+                self.stats.record_llm(prompt_type, time.perf_counter() - start, attempt, usage)
+
+    async def gather(self, prompts, default, prompt_type="prompt"):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(prompt):
+            try:
+                return await self.complete(prompt, semaphore, prompt_type)
+            except openai.error.OpenAIError as error:
+                print(f"LLM request failed: {error}")
+                return default
+
+        return await asyncio.gather(*[run(prompt) for prompt in prompts])
+
+    # Run all prompts concurrently and return the answers in input order
+    def map(self, prompts, default=None, prompt_type="prompt"):
+        prompts = list(prompts)
+        if len(prompts) == 0:
+            return []
+        return asyncio.run(self.gather(prompts, default, prompt_type))
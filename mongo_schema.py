@@ -0,0 +1,159 @@
+# Import libraries
+import argparse
+import os
+
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from review_schema import NULLABLE_COLUMNS
+from targets import DEFAULT_TARGET, TARGET_FIELDS, target_key, target_match
+
+# Fields each query path reads, so MongoDB only sends those back
+REVIEW_ID_PROJECTION = {"reviewId": 1, "_id": 0}
+WATERMARK_PROJECTION = {"at": 1, "_id": 0}
+ROLLUP_PROJECTION = {"app_id": 1, "lang": 1, "country": 1, "at": 1, "score": 1, "topic": 1, "_id": 0}
+TRAINING_PROJECTION = {"content_original": 1, "topic": 1, "_id": 0}
+TIMESTAMP_PROJECTION = {"timestamp": 1, "_id": 0}
+RUN_STATS_PROJECTION = {"app_id": 1, "lang": 1, "country": 1, "started_at": 1, "status": 1, "duration_seconds": 1, "cost_usd": 1, "llm_calls": 1, "total_tokens": 1, "write": 1, "stages": 1, "refresh": 1, "_id": 0}
+FINGERPRINT_PROJECTION = {"reviewId": 1, "fingerprint": 1, "text_fingerprint": 1, "score": 1, "at": 1, "repliedAt": 1, "_id": 0}
+UNFINGERPRINTED_PROJECTION = {"reviewId": 1, "content_original": 1, "replyContent": 1, "_id": 0}
+APP_SNAPSHOT_PROJECTION = {"day": 1, "installs": 1, "realInstalls": 1, "ratings": 1, "score": 1, "histogram": 1, "_id": 0}
+
+def topic_review_projection(content_column):
+    return {content_column: 1, "score": 1, "_id": 0}
+
+# One-off schema checks and migrations are remembered here, next to the per-target ingest state keyed "app:lang:country"
+SCHEMA_STATE_ID = "schema"
+
+def load_schema_state(db):
+    return db["ingest_state"].find_one({"_id": SCHEMA_STATE_ID}) or {}
+
+def save_schema_state(db, **fields):
+    db["ingest_state"].update_one({"_id": SCHEMA_STATE_ID}, {"$set": fields}, upsert=True)
+
+def has_duplicate_reviews(collection):
+    pipeline = [
+        {"$group": {"_id": "$reviewId", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 1}
+    ]
+    return len(list(collection.aggregate(pipeline, allowDiskUse=True))) > 0
+
+# Swap the plain reviewId index for a unique one once no duplicates are stored, otherwise leave the plain one in place;
+# finding duplicates is remembered, so the full scan runs once rather than on every start until `dedupe` clears it
+def ensure_unique_review_id(db, swap=True):
+    collection = db["google_play_store_reviews"]
+    indexes = collection.index_information()
+    if indexes.get("reviewId_1", {}).get("unique"):
+        return True
+
+    if swap and load_schema_state(db).get("duplicate_reviews"):
+        print("Duplicate reviews are stored, run `python mongo_schema.py dedupe` to make the reviewId index unique")
+    elif swap and has_duplicate_reviews(collection):
+        save_schema_state(db, duplicate_reviews=True)
+        print("Duplicate reviews are stored, run `python mongo_schema.py dedupe` to make the reviewId index unique")
+    elif swap:
+        if "reviewId_1" in indexes:
+            collection.drop_index("reviewId_1")
+        try:
+            collection.create_index("reviewId", unique=True)
+            return True
+        except (DuplicateKeyError, OperationFailure) as error:
+            # A duplicate written since the check
+            save_schema_state(db, duplicate_reviews=True)
+            print(f"Could not create a unique reviewId index: {error}")
+    collection.create_index("reviewId")
+    return False
+
+# Every target-scoped query filters on app, language and country first
+def target_index(*keys):
+    return [*[(field, ASCENDING) for field in TARGET_FIELDS], *keys]
+
+# Create every index the ingest job and the dashboard rely on, safe to call on every start; readers leave the reviewId index as it is
+def ensure_indexes(db, unique_review_id=True):
+    reviews = db["google_play_store_reviews"]
+    reviews.create_index("at")
+    reviews.create_index(target_index(("at", DESCENDING)))
+    reviews.create_index(target_index(("topic", ASCENDING), ("at", DESCENDING)))
+    ensure_unique_review_id(db, swap=unique_review_id)
+    # Rollups keyed by the day alone are left out until `migrate_untagged` removes them
+    db["daily_rollups"].create_index(target_index(("day", ASCENDING)), unique=True, partialFilterExpression={"day": {"$exists": True}})
+
+    # Snapshots used to be unique per app and day, which two locales of one app would break
+    if "app_id_1_day_-1" in db["app_snapshots"].index_information():
+        db["app_snapshots"].drop_index("app_id_1_day_-1")
+    db["app_snapshots"].create_index(target_index(("day", DESCENDING)), unique=True)
+    db["run_stats"].create_index("started_at")
+
+# Tag what was stored before targets existed with the default target; returns whether the rollups need a rebuild
+def migrate_untagged(db, target=DEFAULT_TARGET):
+    db["google_play_store_reviews"].update_many({"app_id": {"$exists": False}}, {"$set": target_match(target)})
+    db["app_snapshots"].update_many({"lang": {"$exists": False}}, {"$set": {"lang": target["lang"], "country": target["country"]}})
+    db["run_stats"].update_many({"app_id": {"$exists": False}}, {"$set": target_match(target)})
+
+    # The watermark used to be keyed by the app alone
+    state = db["ingest_state"].find_one({"_id": target["app_id"]})
+    if state is not None:
+        if db["ingest_state"].find_one({"_id": target_key(target)}) is None:
+            db["ingest_state"].insert_one({**state, "_id": target_key(target)})
+        db["ingest_state"].delete_one({"_id": target["app_id"]})
+
+    # Rollups used to be keyed by the day alone
+    return db["daily_rollups"].delete_many({"day": {"$exists": False}}).deleted_count > 0
+
+# Turn the "empty" sentinel strings of older documents into real nulls and add their sentiment; returns how many documents changed
+def migrate_sentinels(collection, fields):
+    # One scan to find out whether anything is left, so a migrated collection costs a single query per run
+    pending = [{field: "empty"} for field in fields] + [{"sentiment": {"$exists": False}}]
+    if collection.find_one({"$or": pending}, {"_id": 1}) is None:
+        return 0
+
+    migrated = 0
+    for field in fields:
+        migrated += collection.update_many({field: "empty"}, {"$set": {field: None}}).modified_count
+    migrated += collection.update_many({"sentiment": {"$exists": False}}, [{"$set": {"sentiment": {"$switch": {
+        "branches": [{"case": {"$lt": ["$score", 3]}, "then": "negative"}, {"case": {"$eq": ["$score", 3]}, "then": "neutral"}],
+        "default": "positive"
+    }}}}]).modified_count
+    return migrated
+
+# The same migration run once per database, later starts only read the schema state instead of scanning the reviews
+def migrate_sentinels_once(db, fields):
+    if load_schema_state(db).get("sentinels_migrated"):
+        return 0
+    migrated = migrate_sentinels(db["google_play_store_reviews"], fields)
+    save_schema_state(db, sentinels_migrated=True)
+    return migrated
+
+# Delete every stored copy of a review but the first one
+def remove_duplicate_reviews(collection):
+    pipeline = [
+        {"$group": {"_id": "$reviewId", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    removed = 0
+    for doc in collection.aggregate(pipeline, allowDiskUse=True):
+        removed += collection.delete_many({"_id": {"$in": doc["ids"][1:]}}).deleted_count
+    return removed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the MongoDB indexes, optionally removing duplicate reviews, sentinel values or untagged documents first.")
+    parser.add_argument("command", choices=["indexes", "dedupe", "nulls", "targets"])
+    args = parser.parse_args()
+
+    client = MongoClient(
+        os.environ["MONGODB_URL"],
+        serverSelectionTimeoutMS=300000
+    )
+    db = client["vidio"]
+
+    if args.command == "nulls":
+        print(f"Replaced the sentinel values of {migrate_sentinels(db['google_play_store_reviews'], NULLABLE_COLUMNS):,} fields with nulls")
+    if args.command == "targets" and migrate_untagged(db):
+        print("Removed the rollups keyed by day alone, run `python rollups.py backfill` to rebuild them per target")
+    if args.command == "dedupe":
+        print(f"Removed {remove_duplicate_reviews(db['google_play_store_reviews']):,} duplicate reviews")
+    # Look for duplicates again instead of trusting what an earlier start found
+    if args.command in ["indexes", "dedupe"]:
+        save_schema_state(db, duplicate_reviews=False)
+    ensure_indexes(db)
+    print("Indexes are in place")
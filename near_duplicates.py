@@ -0,0 +1,129 @@
+# Import libraries
+import re
+import string
+import threading
+import emoji
+import numpy as np
+import pandas as pd
+
+# Mersenne prime for the MinHash permutations, small enough that a * x + b never overflows 64 bits
+PRIME = (1 << 31) - 1
+
+PUNCTUATION_PATTERN = re.compile(f"[{re.escape(string.punctuation)}]")
+REPEATED_PATTERN = re.compile(r"(.)\1+")
+
+# Reduce small variants like "iklan nya kebanyakan!! 😡😡" and "Iklannya kebanyakaaan" to the same string
+def normalize_review(text):
+    text = emoji.replace_emoji(str(text), replace=" ").lower()
+    text = PUNCTUATION_PATTERN.sub(" ", text)
+    text = REPEATED_PATTERN.sub(r"\1", text)
+    return re.sub(r"\s+", "", text)
+
+def shingles(text, k=3):
+    if len(text) <= k:
+        return [text]
+    return [text[i:i + k] for i in range(len(text) - k + 1)]
+
+# Greedy MinHash/LSH clustering: every text joins the first cluster leader it is similar enough to, or leads a new cluster
+class NearDuplicateIndex:
+    def __init__(self, threshold=0.8, num_perm=128, bands=16, seed=1):
+        rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.a = rng.integers(1, PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, size=num_perm, dtype=np.uint64)
+
+        # LSH buckets only hold leaders, so a popular complaint costs one comparison per band instead of one per copy
+        self.buckets = {}
+        self.signatures = []
+        self.results = []
+        self.members = []
+        self.texts = 0
+        self.lock = threading.Lock()
+
+    # MinHash signature of every text, None where nothing is left after normalization
+    def signatures_of(self, texts, block_size=1_000):
+        normalized = [normalize_review(text) for text in texts]
+        signatures = [None] * len(texts)
+        for start in range(0, len(texts), block_size):
+            block = [(i, shingles(normalized[i])) for i in range(start, min(start + block_size, len(texts))) if normalized[i] != ""]
+            if len(block) == 0:
+                continue
+
+            # Hash every shingle of the block at once, then take the minimum per text and permutation
+            all_shingles = np.asarray([shingle for _, text_shingles in block for shingle in text_shingles], dtype=object)
+            hashes = pd.util.hash_array(all_shingles) & np.uint64(PRIME)
+            permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % np.uint64(PRIME)
+            offsets = np.cumsum([0] + [len(text_shingles) for _, text_shingles in block[:-1]])
+            block_signatures = np.minimum.reduceat(permuted, offsets, axis=1).T.astype(np.uint32)
+            for (i, _), signature in zip(block, block_signatures):
+                signatures[i] = signature
+        return signatures
+
+    def band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def find_leader(self, signature, keys):
+        for key in keys:
+            for leader in self.buckets.get(key, []):
+                if np.mean(self.signatures[leader] == signature) >= self.threshold:
+                    return leader
+        return None
+
+    def add_leader(self, signature, keys):
+        leader = len(self.results)
+        self.signatures.append(signature)
+        self.results.append(None)
+        self.members.append(0)
+        for key in keys:
+            self.buckets.setdefault(key, []).append(leader)
+        return leader
+
+    # Send one text per new cluster to `enrich` and give every member its leader's result
+    def enrich(self, texts, enrich):
+        texts = list(texts)
+        signatures = self.signatures_of(texts)
+
+        leaders = []
+        new_leaders = {}
+        with self.lock:
+            self.texts += len(texts)
+            for text, signature in zip(texts, signatures):
+                keys = self.band_keys(signature) if signature is not None else []
+                leader = self.find_leader(signature, keys) if signature is not None else None
+                if leader is None:
+                    leader = self.add_leader(signature, keys)
+                    new_leaders[leader] = text
+                self.members[leader] += 1
+                leaders.append(leader)
+
+        computed = {}
+        if len(new_leaders) > 0:
+            english, topics = enrich(list(new_leaders.values()))
+            computed = dict(zip(new_leaders, zip(english, topics)))
+            with self.lock:
+                for leader, result in computed.items():
+                    # A failed result only goes to this call's members, later variants try again
+                    if None not in result:
+                        self.results[leader] = result
+
+        results = [computed[leader] if leader in computed else self.results[leader] for leader in leaders]
+
+        # Leaders another thread is still enriching are not waited for, their members are enriched themselves
+        pending = [i for i, result in enumerate(results) if result is None]
+        if len(pending) > 0:
+            english, topics = enrich([texts[i] for i in pending])
+            for i, result in zip(pending, zip(english, topics)):
+                results[i] = result
+
+        return [result[0] for result in results], [result[1] for result in results]
+
+    def cluster_sizes(self):
+        return np.asarray(self.members, dtype=np.int64)
+
+    def report(self):
+        sizes = self.cluster_sizes()
+        saved = self.texts - len(sizes)
+        largest = sizes.max() if len(sizes) > 0 else 0
+        return f"Near duplicates: {self.texts:,} texts in {len(sizes):,} clusters ({(sizes > 1).sum():,} with variants, largest {largest:,}), {saved:,} enrichments saved"
@@ -0,0 +1,143 @@
+# Import libraries
+import os
+import datetime
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+import streamlit as st
+from pymongo import MongoClient
+from run_stats import load_runs
+from targets import load_targets, target_label
+
+# Change the page settings
+st.set_page_config(
+    page_title="Vidio Reviews Dashboard - Daily Job",
+    layout="wide",
+    page_icon="https://raw.githubusercontent.com/darren7753/vidio_google_play_store_reviews/main/Logo_Vidio_V2.png"
+)
+
+# Remove red line at the top and "Made with Streamlit" writing at the bottom
+hide_decoration_bar_style = """
+    <style>
+        header {visibility: hidden;}
+        footer {visibility: hidden;}
+    </style>
+"""
+st.markdown(hide_decoration_bar_style, unsafe_allow_html=True)
+
+# Create a connection to MongoDB
+@st.cache_resource
+def init_connection():
+    return MongoClient(
+        os.environ["MONGODB_URL"],
+        serverSelectionTimeoutMS=300000
+    )
+
+client = init_connection()
+
+@st.cache_data(ttl=600)
+def load_run_history(target, since):
+    return load_runs(client["vidio"]["run_stats"], target, since)
+
+lnk = '<link rel="stylesheet" href="https://use.fontawesome.com/releases/v5.12.1/css/all.css" crossorigin="anonymous">'
+st.markdown(lnk + "<h2><i class='fas fa-cogs' style='font-size: 30px; color: #ed203f;'></i>&nbsp;Daily Job</h2>", unsafe_allow_html=True)
+
+# Every target is scraped by its own run, so pick which one to show when there are several
+targets = load_targets()
+target = targets[0]
+if len(targets) > 1:
+    target = st.selectbox(label="App and Locale", options=targets, format_func=target_label)
+
+n_days = st.selectbox(label="Period", options=[30, 90, 365], format_func=lambda days: f"Last {days} days")
+since = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=n_days), datetime.time(0, 0, 0))
+df_runs = load_run_history(target, since)
+
+if len(df_runs) == 0:
+    st.write("No runs were recorded in this period yet.")
+    st.stop()
+
+# Score cards of the latest run
+latest = df_runs.iloc[-1]
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Last Run", f"{latest['duration_seconds'] / 60:.1f} min", latest["status"], delta_color="off")
+col2.metric("Last Run Cost", f"${latest['cost_usd']:.4f}")
+col3.metric("LLM Calls", f"{int(latest['llm_calls']):,}")
+col4.metric("Mongo Write Rate", f"{latest['docs_per_second']:,.0f} docs/s")
+
+# Graphic showing job duration and cost per run
+st.markdown("<h4>Job Duration and Cost</h4>", unsafe_allow_html=True)
+
+fig = make_subplots(specs=[[{"secondary_y": True}]])
+fig.add_trace(
+    go.Bar(
+        x=df_runs.index,
+        y=df_runs["duration_seconds"] / 60,
+        name="Duration (min)",
+        marker_color=["#0088cc" if status == "success" else "#fc576c" for status in df_runs["status"]]
+    ),
+    secondary_y=False
+)
+fig.add_trace(
+    go.Scatter(
+        x=df_runs.index,
+        y=df_runs["cost_usd"],
+        mode="lines+markers",
+        name="Cost (USD)",
+        line=dict(color="#feac00", width=2.5)
+    ),
+    secondary_y=True
+)
+fig.update_layout(
+    plot_bgcolor="rgba(0, 0, 0, 0)",
+    paper_bgcolor="rgba(0, 0, 0, 0)",
+    height=350,
+    margin={"r":0, "l":0, "t":0, "b":0},
+    yaxis2=dict(showgrid=False)
+)
+st.plotly_chart(fig,use_container_width=True)
+
+# Graphic showing where the time of every run went
+st.markdown("<h4>Time per Stage</h4>", unsafe_allow_html=True)
+
+stage_columns = [column for column in df_runs.columns if column.endswith("_seconds") and column != "duration_seconds"]
+fig = go.Figure()
+for column in stage_columns:
+    fig.add_trace(go.Bar(
+        x=df_runs.index,
+        y=df_runs[column].fillna(0),
+        name=column.replace("_seconds", "").replace("_", " ").capitalize()
+    ))
+fig.update_layout(
+    barmode="stack",
+    plot_bgcolor="rgba(0, 0, 0, 0)",
+    paper_bgcolor="rgba(0, 0, 0, 0)",
+    height=350,
+    margin={"r":0, "l":0, "t":0, "b":0},
+)
+fig.update_traces(
+    hovertemplate="Date: %{x|%b %d, %Y}<br>" + "Seconds: %{y:.1f}"
+)
+st.plotly_chart(fig,use_container_width=True)
+
+# Graphic showing the edits and developer replies the refresh of recent reviews found
+if "refresh_changed" in df_runs.columns:
+    st.markdown("<h4>Edits and Replies Found</h4>", unsafe_allow_html=True)
+
+    fig = go.Figure()
+    for column, name, color in [("refresh_text_edits", "Text Edits", "#0088cc"), ("refresh_score_edits", "Score Edits", "#feac00"), ("refresh_reply_updates", "Reply Updates", "#12b95c")]:
+        fig.add_trace(go.Bar(
+            x=df_runs.index,
+            y=df_runs[column].fillna(0),
+            name=name,
+            marker_color=color
+        ))
+    fig.update_layout(
+        barmode="group",
+        plot_bgcolor="rgba(0, 0, 0, 0)",
+        paper_bgcolor="rgba(0, 0, 0, 0)",
+        height=350,
+        margin={"r":0, "l":0, "t":0, "b":0},
+    )
+    fig.update_traces(
+        hovertemplate="Date: %{x|%b %d, %Y}<br>" + "Reviews: %{y:,}"
+    )
+    st.plotly_chart(fig,use_container_width=True)
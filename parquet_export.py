@@ -0,0 +1,62 @@
+# Import libraries
+import argparse
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datetime import timedelta
+from pymongo import MongoClient
+from review_schema import STORED_COLUMNS, apply_dtypes
+
+# Directory of one day's partition, laid out hive-style so pyarrow and DuckDB prune on it
+def partition_path(root, day):
+    return os.path.join(root, f"day={pd.Timestamp(day):%Y-%m-%d}")
+
+def load_day(collection, day):
+    start = pd.Timestamp(day).normalize().to_pydatetime()
+    docs = collection.find({"at": {"$gte": start, "$lt": start + timedelta(days=1)}}, {**{column: 1 for column in STORED_COLUMNS}, "_id": 0})
+    df = pd.DataFrame(list(docs), columns=STORED_COLUMNS)
+    for column in ["at", "repliedAt"]:
+        df[column] = pd.to_datetime(df[column], errors="coerce")
+    return apply_dtypes(df).sort_values("at")
+
+# Rewrite one day's partition from MongoDB, swapping the directory in only once the file is complete
+# (readers skip the underscore-prefixed staging directory)
+def write_day(collection, root, day):
+    df = load_day(collection, day)
+    path = partition_path(root, day)
+    tmp_path = os.path.join(root, "_" + os.path.basename(path))
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), os.path.join(tmp_path, "part-0.parquet"))
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return len(df)
+
+# Export the days touched by the newly stored reviews, leaving every other partition as it is
+def export_days(collection, root, dates):
+    days = sorted({pd.Timestamp(date).normalize() for date in dates})
+    return sum(write_day(collection, root, day) for day in days), len(days)
+
+# Export every day found in the collection
+def backfill_export(collection, root):
+    pipeline = [{"$group": {"_id": {"$dateTrunc": {"date": "$at", "unit": "day"}}}}]
+    days = [doc["_id"] for doc in collection.aggregate(pipeline, allowDiskUse=True)]
+    return export_days(collection, root, days)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the stored reviews to date-partitioned Parquet files.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--path", default=os.environ.get("PARQUET_EXPORT_PATH", "reviews_parquet"))
+    args = parser.parse_args()
+
+    client = MongoClient(
+        os.environ["MONGODB_URL"],
+        serverSelectionTimeoutMS=300000
+    )
+    db = client["vidio"]
+    n_reviews, n_days = backfill_export(db["google_play_store_reviews"], args.path)
+    print(f"Exported {n_reviews:,} reviews in {n_days:,} daily partitions to {args.path}")
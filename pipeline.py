@@ -0,0 +1,99 @@
+# Import libraries
+import queue
+import threading
+
+from dedupe import split_new
+from topics import normalize_topics
+from review_schema import to_documents, to_review_frame
+from run_stats import count, stage_timer
+
+# Run a stage in a background thread, keeping at most `maxsize` chunks ready ahead of the consumer
+def prefetch(chunks, maxsize=2):
+    buffer = queue.Queue(maxsize)
+    done = object()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        except BaseException as error:
+            buffer.put(error)
+        buffer.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        chunk = buffer.get()
+        if chunk is done:
+            return
+        if isinstance(chunk, BaseException):
+            raise chunk
+        yield chunk
+
+# Each chunk is a dict holding one page of reviews and the checkpoint to call once it is stored
+def scrape_stage(pages, stats=None):
+    pages = iter(pages)
+    while True:
+        with stage_timer(stats, "scrape"):
+            item = next(pages, None)
+        if item is None:
+            return
+        page, checkpoint = item
+        count(stats, "scraped", len(page))
+        yield {"reviews": page, "checkpoint": checkpoint}
+
+# Keep only the reviews that are not stored yet
+def dedupe_stage(chunks, review_index, stats=None):
+    for chunk in chunks:
+        with stage_timer(stats, "dedupe"):
+            reviews = to_review_frame(chunk["reviews"])
+            new_reviews, _ = split_new(review_index, reviews)
+
+            # Reviews in flight count as seen, so a later page cannot enrich them again
+            review_index.add(new_reviews["reviewId"])
+        count(stats, "new", len(new_reviews))
+        yield {**chunk, "reviews": new_reviews}
+
+# Only negative and neutral reviews get translated and labeled
+def negatives_stage(chunks, stats=None):
+    for chunk in chunks:
+        reviews = chunk["reviews"]
+        negatives = reviews[reviews["score"] <= 3]
+        count(stats, "negatives", len(negatives))
+        yield {**chunk, "negatives": negatives}
+
+def enrich_stage(chunks, enrich, stats=None):
+    for chunk in chunks:
+        negatives = chunk["negatives"]
+        with stage_timer(stats, "enrich"):
+            english, topics = enrich(negatives["content_original"].tolist()) if len(negatives) > 0 else ([], [])
+        yield {**chunk, "english": english, "topics": topics}
+
+# Fill the enriched columns of the negatives in place, the other reviews keep their nulls
+def normalize_stage(chunks, stats=None):
+    for chunk in chunks:
+        with stage_timer(stats, "normalize"):
+            reviews = chunk["reviews"].copy()
+            rows = chunk["negatives"].index
+            reviews.loc[rows, "content_english"] = chunk["english"]
+            reviews.loc[rows, "topic"] = normalize_topics(chunk["topics"]).to_numpy()
+        yield {**chunk, "reviews": reviews}
+
+# Store each chunk, then let the caller refresh anything derived from it and checkpoint the scraper
+def write_stage(chunks, writer, after_write=None, stats=None):
+    for chunk in chunks:
+        reviews = chunk["reviews"]
+        if len(reviews) > 0:
+            with stage_timer(stats, "write"):
+                writer.write(to_documents(reviews))
+            if after_write is not None:
+                after_write(reviews)
+        chunk["checkpoint"]()
+
+# scrape -> dedupe -> filter negatives -> enrich -> normalize -> write, with scraping and enrichment running ahead of the writer
+def run_pipeline(pages, review_index, enrich, writer, after_write=None, maxsize=2, stats=None):
+    chunks = prefetch(scrape_stage(pages, stats), maxsize)
+    chunks = dedupe_stage(chunks, review_index, stats)
+    chunks = negatives_stage(chunks, stats)
+    chunks = prefetch(enrich_stage(chunks, enrich, stats), maxsize)
+    chunks = normalize_stage(chunks, stats)
+    write_stage(chunks, writer, after_write, stats)
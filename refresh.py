@@ -0,0 +1,123 @@
+# Import libraries
+import pandas as pd
+
+from datetime import datetime, timedelta
+from google_play_scraper.features.reviews import MAX_COUNT_EACH_FETCH
+from scraper import scan_pages
+from rollups import update_rollups
+from topics import normalize_topics
+from review_schema import fingerprint, to_documents, to_review_frame
+from mongo_schema import FINGERPRINT_PROJECTION, UNFINGERPRINTED_PROJECTION
+from targets import TARGET_FIELDS
+
+# Fields rewritten on every changed review; the enrichment is only rewritten when the review needs a new one
+REFRESHED_COLUMNS = ["reviewId", "content_original", "score", "sentiment", "thumbsUpCount", "reviewCreatedVersion", "at", "replyContent", "repliedAt", "fingerprint", "text_fingerprint"]
+ENRICHED_COLUMNS = ["content_english", "topic"]
+COUNTERS = ["scanned", "not_stored", "unchanged", "changed", "text_edits", "score_edits", "reply_updates", "enriched", "cleared", "fingerprinted"]
+
+def columns_of(projection):
+    return [column for column in projection if column != "_id"]
+
+# Documents stored by the first version of the job can still hold the "empty" sentinel where Google Play returned nothing
+def without_sentinels(df):
+    return df.mask(df.isin(["empty"]))
+
+# Re-scan the last few days of reviews and update the stored ones whose score, text or reply changed since they were scraped
+class ReviewRefresh:
+    def __init__(self, db, writer, enrich):
+        self.collection = db["google_play_store_reviews"]
+        self.rollup_collection = db["daily_rollups"]
+        self.writer = writer
+        self.enrich = enrich
+        self.counts = {name: 0 for name in COUNTERS}
+        self.days = set()
+
+    # Fingerprints of the stored copies, computed here for documents stored before fingerprints existed
+    def load_stored(self, ids):
+        # Kept as objects, so a missing fingerprint does not turn the others into lossy floats
+        docs = self.collection.find({"reviewId": {"$in": ids}}, FINGERPRINT_PROJECTION)
+        stored = without_sentinels(pd.DataFrame(list(docs), columns=columns_of(FINGERPRINT_PROJECTION), dtype=object).set_index("reviewId"))
+        # Duplicates stored before the unique reviewId index are compared once, as the update only reaches one copy until `dedupe` removes the rest
+        stored = stored[~stored.index.duplicated()]
+        stored["unfingerprinted"] = stored["fingerprint"].isna()
+
+        missing = stored.index[stored["unfingerprinted"]].tolist()
+        if len(missing) > 0:
+            docs = self.collection.find({"reviewId": {"$in": missing}}, UNFINGERPRINTED_PROJECTION)
+            raw = without_sentinels(pd.DataFrame(list(docs), columns=columns_of(UNFINGERPRINTED_PROJECTION), dtype=object).set_index("reviewId"))
+            raw = raw[~raw.index.duplicated()]
+            raw = raw.join(stored[["score", "repliedAt"]])
+            stored.loc[raw.index, "fingerprint"] = fingerprint(raw)
+            stored.loc[raw.index, "text_fingerprint"] = fingerprint(raw, ["content_original"])
+        return stored
+
+    def refresh_page(self, page):
+        reviews = to_review_frame(page).drop_duplicates("reviewId").set_index("reviewId", drop=False)
+        stored = self.load_stored(reviews["reviewId"].tolist())
+        self.counts["scanned"] += len(reviews)
+
+        # Reviews not stored yet are left to the regular scrape
+        is_stored = reviews.index.isin(stored.index)
+        self.counts["not_stored"] += int((~is_stored).sum())
+        reviews = reviews[is_stored]
+        stored = stored.loc[reviews.index]
+
+        # Compared as plain int64 arrays, every fingerprint is filled in by now
+        changed = reviews["fingerprint"].to_numpy("int64") != stored["fingerprint"].to_numpy("int64")
+        text_edited = changed & (reviews["text_fingerprint"].to_numpy("int64") != stored["text_fingerprint"].to_numpy("int64"))
+        score_edited = changed & (reviews["score"].to_numpy() != stored["score"].to_numpy())
+        replied = changed & ((fingerprint(reviews, ["repliedAt"]) != fingerprint(stored, ["repliedAt"])).to_numpy() | ~(text_edited | score_edited))
+
+        # Negative reviews are enriched again when their text changed or they just became negative, the others lose their enrichment
+        negative = (reviews["score"] <= 3).to_numpy()
+        was_negative = (stored["score"] <= 3).to_numpy()
+        to_enrich = changed & negative & (text_edited | ~was_negative)
+        to_clear = changed & ~negative & was_negative
+
+        if to_enrich.any():
+            english, topics = self.enrich(reviews.loc[to_enrich, "content_original"].tolist())
+            reviews.loc[to_enrich, "content_english"] = english
+            reviews.loc[to_enrich, "topic"] = normalize_topics(topics).to_numpy()
+
+        # Targeted $set updates: the changed fields, and only the fingerprints of old documents that did not change
+        unfingerprinted = ~changed & stored["unfingerprinted"].to_numpy()
+        self.writer.write(to_documents(reviews.loc[to_enrich | to_clear, REFRESHED_COLUMNS + ENRICHED_COLUMNS]), insert_only=TARGET_FIELDS)
+        self.writer.write(to_documents(reviews.loc[changed & ~(to_enrich | to_clear), REFRESHED_COLUMNS]))
+        self.writer.write(to_documents(pd.DataFrame({
+            "reviewId": reviews.index[unfingerprinted],
+            "fingerprint": stored.loc[unfingerprinted, "fingerprint"].astype("int64").to_numpy(),
+            "text_fingerprint": stored.loc[unfingerprinted, "text_fingerprint"].astype("int64").to_numpy()
+        })))
+
+        # An edit can move a review to another day, so both days' rollups are refreshed
+        self.days.update(pd.to_datetime(reviews.loc[changed, "at"]).dt.normalize())
+        self.days.update(pd.to_datetime(stored.loc[changed, "at"]).dt.normalize())
+
+        self.counts["unchanged"] += int((~changed).sum())
+        self.counts["changed"] += int(changed.sum())
+        self.counts["text_edits"] += int(text_edited.sum())
+        self.counts["score_edits"] += int(score_edited.sum())
+        self.counts["reply_updates"] += int(replied.sum())
+        self.counts["enriched"] += int(to_enrich.sum())
+        self.counts["cleared"] += int(to_clear.sum())
+        self.counts["fingerprinted"] += int(unfingerprinted.sum())
+
+    # Scan the target's reviews of the last `days` days, newest first, then refresh the rollups of every day that changed
+    def run(self, target, days, limiter=None, page_size=MAX_COUNT_EACH_FETCH):
+        since = datetime.now() - timedelta(days=days)
+        for page, _, _, _ in scan_pages(target["app_id"], target["lang"], target["country"], None, since, set(), page_size, limiter):
+            if len(page) > 0:
+                self.refresh_page(page)
+        update_rollups(self.collection, self.rollup_collection, target, self.days)
+        return self.counts
+
+    def report(self):
+        counts = self.counts
+        return (
+            f"Refresh: {counts['scanned']:,} recent reviews scanned, {counts['changed']:,} changed "
+            f"({counts['text_edits']:,} text edits, {counts['score_edits']:,} score edits, {counts['reply_updates']:,} reply updates), "
+            f"{counts['enriched']:,} enriched again, {counts['cleared']:,} no longer negative, {counts['fingerprinted']:,} old documents fingerprinted"
+        )
+
+    def to_doc(self):
+        return dict(self.counts)
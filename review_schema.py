@@ -0,0 +1,75 @@
+# Import libraries
+import pandas as pd
+
+from topics import TOPICS
+
+SENTIMENTS = ["negative", "neutral", "positive"]
+
+TOPIC_DTYPE = pd.CategoricalDtype(TOPICS)
+SENTIMENT_DTYPE = pd.CategoricalDtype(SENTIMENTS)
+
+# Type of every stored review field, missing values are real nulls rather than sentinel strings
+REVIEW_DTYPES = {
+    "app_id": "object",
+    "lang": "object",
+    "country": "object",
+    "reviewId": "object",
+    "userName": "object",
+    "userImage": "object",
+    "content_original": "object",
+    "content_english": "object",
+    "score": "int8",
+    "sentiment": SENTIMENT_DTYPE,
+    "thumbsUpCount": "int32",
+    "reviewCreatedVersion": "object",
+    "at": "datetime64[ns]",
+    "replyContent": "object",
+    "repliedAt": "datetime64[ns]",
+    "topic": TOPIC_DTYPE,
+    # Nullable, documents stored before fingerprints existed have none
+    "fingerprint": "Int64",
+    "text_fingerprint": "Int64"
+}
+STORED_COLUMNS = list(REVIEW_DTYPES)
+
+# What a refresh compares to spot edited scores, edited texts and developer replies
+FINGERPRINT_COLUMNS = ["score", "content_original", "replyContent", "repliedAt"]
+
+# Fields the first version of the job filled with the "empty" sentinel when Google Play or the enrichment left them missing
+NULLABLE_COLUMNS = ["userName", "userImage", "content_original", "content_english", "reviewCreatedVersion", "replyContent", "repliedAt", "topic"]
+
+def to_sentiment(scores):
+    return pd.cut(pd.Series(scores), bins=[0, 2, 3, 5], labels=SENTIMENTS).astype(SENTIMENT_DTYPE)
+
+# 64-bit hash of the given fields of every review, the same whether the values came from Google Play or MongoDB
+def fingerprint(df, columns=FINGERPRINT_COLUMNS):
+    parts = []
+    for column in columns:
+        values = df[column]
+        if column in ["at", "repliedAt"]:
+            values = pd.to_datetime(values).dt.strftime("%Y-%m-%dT%H:%M:%S")
+        elif pd.api.types.is_numeric_dtype(values):
+            values = values.astype("Int64")
+        parts.append(values.astype("string").fillna(""))
+    joined = parts[0].str.cat(parts[1:], sep="\x1f") if len(parts) > 1 else parts[0]
+    return pd.Series(pd.util.hash_array(joined.to_numpy(dtype=object)).view("int64"), index=df.index)
+
+# Cast a page of reviews to the stored schema, adding any column that is not filled in yet
+def to_review_frame(df):
+    df = df.rename(columns={"content": "content_original"})
+    for column in STORED_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    df["sentiment"] = to_sentiment(df["score"]).to_numpy()
+    df["fingerprint"] = fingerprint(df)
+    df["text_fingerprint"] = fingerprint(df, ["content_original"])
+    return df[STORED_COLUMNS].astype(REVIEW_DTYPES)
+
+# Plain Python records with None for every missing value, ready for MongoDB
+def to_documents(df):
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict("records")
+
+# Cast the columns of a frame read back from MongoDB, leaving the ones it does not have
+def apply_dtypes(df):
+    return df.astype({column: dtype for column, dtype in REVIEW_DTYPES.items() if column in df.columns})
@@ -0,0 +1,76 @@
+# Import libraries
+import argparse
+import os
+import pandas as pd
+
+from datetime import timedelta
+from pymongo import MongoClient, ReplaceOne
+from topics import TOPICS
+from mongo_schema import ROLLUP_PROJECTION
+from targets import TARGET_FIELDS, target_match
+
+def sentiment_counts():
+    return {
+        "positive": {"$sum": {"$cond": [{"$gt": ["$score", 3]}, 1, 0]}},
+        "neutral": {"$sum": {"$cond": [{"$eq": ["$score", 3]}, 1, 0]}},
+        "negative": {"$sum": {"$cond": [{"$lt": ["$score", 3]}, 1, 0]}}
+    }
+
+# Count reviews, scores, sentiments and topics per target and day for the reviews matching `match`
+def daily_rollup_pipeline(match):
+    return [
+        {"$match": match},
+        {"$project": ROLLUP_PROJECTION},
+        {"$group": {
+            "_id": {**{field: f"${field}" for field in TARGET_FIELDS}, "day": {"$dateTrunc": {"date": "$at", "unit": "day"}}},
+            "count": {"$sum": 1},
+            "score_sum": {"$sum": "$score"},
+            **sentiment_counts(),
+            **{f"topic_{i}": {"$sum": {"$cond": [{"$eq": ["$topic", topic]}, 1, 0]}} for i, topic in enumerate(TOPICS)}
+        }}
+    ]
+
+def to_rollup(doc):
+    return {
+        **doc["_id"],
+        "count": doc["count"],
+        "score_sum": doc["score_sum"],
+        "positive": doc["positive"],
+        "neutral": doc["neutral"],
+        "negative": doc["negative"],
+        "topics": {topic: doc[f"topic_{i}"] for i, topic in enumerate(TOPICS)}
+    }
+
+def write_rollups(rollup_collection, docs):
+    requests = [ReplaceOne(doc["_id"], to_rollup(doc), upsert=True) for doc in docs]
+    if len(requests) > 0:
+        rollup_collection.bulk_write(requests, ordered=False)
+    return len(requests)
+
+# Recompute the rollups of one target's days touched by `dates` from the raw reviews
+def update_rollups(review_collection, rollup_collection, target, dates):
+    days = sorted({pd.Timestamp(date).normalize() for date in dates})
+    if len(days) == 0:
+        return 0
+
+    match = {**target_match(target), "$or": [{"at": {"$gte": day.to_pydatetime(), "$lt": (day + timedelta(days=1)).to_pydatetime()}} for day in days]}
+    return write_rollups(rollup_collection, review_collection.aggregate(daily_rollup_pipeline(match)))
+
+# Rebuild every rollup from the raw collection
+def backfill_rollups(review_collection, rollup_collection):
+    docs = list(review_collection.aggregate(daily_rollup_pipeline({}), allowDiskUse=True))
+    rollup_collection.delete_many({})
+    return write_rollups(rollup_collection, docs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the daily_rollups collection used by the dashboard.")
+    parser.add_argument("command", choices=["backfill"])
+    args = parser.parse_args()
+
+    client = MongoClient(
+        os.environ["MONGODB_URL"],
+        serverSelectionTimeoutMS=300000
+    )
+    db = client["vidio"]
+    n_days = backfill_rollups(db["google_play_store_reviews"], db["daily_rollups"])
+    print(f"Rebuilt {n_days:,} daily rollups")
@@ -0,0 +1,125 @@
+# Import libraries
+import contextlib
+import threading
+import time
+import traceback
+import pandas as pd
+
+from datetime import datetime
+from mongo_schema import RUN_STATS_PROJECTION
+from targets import target_match
+
+# USD per 1,000 tokens, used to estimate what a run cost
+COST_PER_1K_TOKENS = {"gpt-3.5-turbo": 0.002}
+
+# Columns of the run history shown on the dashboard
+RUN_COLUMNS = ["started_at", "status", "duration_seconds", "cost_usd", "llm_calls", "total_tokens", "docs_per_second"]
+
+# Everything one run of the daily job measured, written to the run_stats collection at the end
+class RunStats:
+    def __init__(self, model):
+        self.model = model
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.llm = {}
+        self.counts = {}
+        self.status = "running"
+        self.error = None
+
+    # Add the wall time of the block to a stage; stages running in other threads are timed separately
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                stage = self.stages.setdefault(name, {"seconds": 0, "calls": 0})
+                stage["seconds"] += seconds
+                stage["calls"] += 1
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    # One finished LLM request; `usage` is the token usage OpenAI returned, None when it failed
+    def record_llm(self, prompt_type, seconds, retries, usage):
+        with self.lock:
+            llm = self.llm.setdefault(prompt_type, {"calls": 0, "failures": 0, "retries": 0, "seconds": 0, "max_seconds": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            llm["calls"] += 1
+            llm["retries"] += retries
+            llm["seconds"] += seconds
+            llm["max_seconds"] = max(llm["max_seconds"], seconds)
+            if usage is None:
+                llm["failures"] += 1
+                return
+            llm["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            llm["completion_tokens"] += usage.get("completion_tokens", 0)
+
+    def total_tokens(self):
+        return sum(llm["prompt_tokens"] + llm["completion_tokens"] for llm in self.llm.values())
+
+    def cost(self):
+        return self.total_tokens() / 1_000 * COST_PER_1K_TOKENS.get(self.model, 0)
+
+    def fail(self, error):
+        self.status = "failed"
+        self.error = "".join(traceback.format_exception_only(type(error), error)).strip()
+
+    def to_doc(self, **extra):
+        duration = time.perf_counter() - self.start
+        with self.lock:
+            llm = {
+                prompt_type: {**values, "mean_seconds": values["seconds"] / values["calls"] if values["calls"] > 0 else 0}
+                for prompt_type, values in self.llm.items()
+            }
+            return {
+                "started_at": self.started_at,
+                "duration_seconds": duration,
+                "status": "success" if self.status == "running" else self.status,
+                "error": self.error,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counts": dict(self.counts),
+                "llm": llm,
+                "llm_calls": sum(values["calls"] for values in llm.values()),
+                "total_tokens": self.total_tokens(),
+                "cost_usd": self.cost(),
+                **extra
+            }
+
+    def report(self):
+        lines = [f"{name}: {stage['seconds']:.1f}s over {stage['calls']:,} chunks" for name, stage in self.stages.items()]
+        lines += [
+            f"{prompt_type} prompts: {llm['calls']:,} calls, {llm['retries']:,} retries, {llm['failures']:,} failed, {llm['prompt_tokens'] + llm['completion_tokens']:,} tokens"
+            for prompt_type, llm in self.llm.items()
+        ]
+        lines.append(f"Estimated LLM cost: ${self.cost():.4f}")
+        return "Run stats:\n  " + "\n  ".join(lines)
+
+# Time a stage when stats are being collected
+def stage_timer(stats, name):
+    return stats.stage(name) if stats is not None else contextlib.nullcontext()
+
+def count(stats, name, amount=1):
+    if stats is not None:
+        stats.count(name, amount)
+
+# Recent runs of one target as one row each, oldest first, for the dashboard
+def load_runs(collection, target, since):
+    docs = collection.find({**target_match(target), "started_at": {"$gte": since}}, RUN_STATS_PROJECTION).sort("started_at", 1)
+    rows = [{
+        "started_at": doc["started_at"],
+        "status": doc.get("status"),
+        "duration_seconds": doc.get("duration_seconds", 0),
+        "cost_usd": doc.get("cost_usd", 0),
+        "llm_calls": doc.get("llm_calls", 0),
+        "total_tokens": doc.get("total_tokens", 0),
+        "docs_per_second": doc.get("write", {}).get("docs_per_second", 0),
+        **{f"refresh_{name}": value for name, value in (doc.get("refresh") or {}).items()},
+        **{f"{name}_seconds": stage["seconds"] for name, stage in doc.get("stages", {}).items()}
+    } for doc in docs]
+    df = pd.DataFrame(rows) if len(rows) > 0 else pd.DataFrame(columns=RUN_COLUMNS)
+    return df.set_index("started_at")
@@ -0,0 +1,40 @@
+# Import libraries
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from llm_client import SharedTokenBucket
+
+# The shared budget of the current worker process, set by `init_worker`
+worker_budget = None
+
+# Google Play and OpenAI limits every target draws on, with the OpenAI concurrency split between the processes
+def make_budget(processes, context):
+    pages_per_minute = float(os.environ.get("PLAY_PAGES_PER_MINUTE", 60))
+    return {
+        "pages": SharedTokenBucket(pages_per_minute, context) if pages_per_minute > 0 else None,
+        "requests": SharedTokenBucket(int(os.environ.get("OPENAI_RPM", 3_500)), context),
+        "tokens": SharedTokenBucket(int(os.environ.get("OPENAI_TPM", 90_000)), context),
+        "max_concurrency": max(1, int(os.environ.get("OPENAI_MAX_CONCURRENCY", 8)) // processes)
+    }
+
+def init_worker(budget):
+    global worker_budget
+    worker_budget = budget
+
+def run_in_worker(run, target):
+    return run(target, worker_budget)
+
+# Call `run(target, budget)` for every target, each in its own process when `processes` > 1, and return the results in target order
+def run_targets(run, targets, processes=1):
+    processes = max(1, min(processes, len(targets)))
+
+    # Spawned workers start without the parent's MongoDB connections, which must not cross a fork
+    context = multiprocessing.get_context("spawn")
+    budget = make_budget(processes, context)
+    if processes == 1:
+        return [run(target, budget) for target in targets]
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker, initargs=(budget,)) as pool:
+        futures = [pool.submit(run_in_worker, run, target) for target in targets]
+        return [future.result() for future in futures]
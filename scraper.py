@@ -0,0 +1,108 @@
+# Import libraries
+import pandas as pd
+
+from google_play_scraper import Sort, reviews
+from google_play_scraper.features.reviews import _ContinuationToken, MAX_COUNT_EACH_FETCH
+from mongo_schema import REVIEW_ID_PROJECTION, WATERMARK_PROJECTION
+from targets import target_key, target_match
+
+# Columns returned by google_play_scraper for every review
+REVIEW_COLUMNS = ["reviewId", "userName", "userImage", "content", "score", "thumbsUpCount", "reviewCreatedVersion", "at", "replyContent", "repliedAt"]
+
+# Load the watermark the previous run left for this target
+def load_state(review_collection, state_collection, target):
+    state = state_collection.find_one({"_id": target_key(target)})
+    if state is not None:
+        return state
+
+    # No state yet, so bootstrap it from the target's newest stored review
+    state = {"_id": target_key(target), "at": None, "reviewIds": [], "resume": None}
+    latest = review_collection.find_one(target_match(target), WATERMARK_PROJECTION, sort=[("at", -1)])
+    if latest is not None:
+        known = review_collection.find({**target_match(target), "at": latest["at"]}, REVIEW_ID_PROJECTION)
+        state["at"] = latest["at"]
+        state["reviewIds"] = [doc["reviewId"] for doc in known]
+    return state
+
+def token_to_doc(token):
+    return {
+        "token": token.token,
+        "lang": token.lang,
+        "country": token.country,
+        "sort": int(token.sort),
+        "count": token.count,
+        "filter_score_with": token.filter_score_with
+    }
+
+def token_from_doc(doc):
+    return _ContinuationToken(**doc)
+
+# Page through the newest reviews until the watermark or a known review is reached, tagging them with the target
+def scan_pages(app_id, lang, country, token, stop_at, stop_ids, page_size, limiter=None):
+    while True:
+        if limiter is not None:
+            limiter.wait()
+        result, token = reviews(
+            app_id,
+            lang=lang,
+            country=country,
+            sort=Sort.NEWEST,
+            count=page_size,
+            continuation_token=token
+        )
+        page = pd.DataFrame(result, columns=REVIEW_COLUMNS).assign(app_id=app_id, lang=lang, country=country)
+
+        reached = False
+        if stop_at is not None:
+            stop = (page["reviewId"].isin(stop_ids) | (page["at"] < stop_at)).to_numpy()
+            if stop.any():
+                page = page.iloc[:stop.argmax()]
+                reached = True
+
+        exhausted = token.token is None or len(result) == 0
+        yield page, token, reached, exhausted
+        if reached or exhausted:
+            return
+
+# Persist a copy of the state once the page it belongs to has been stored
+def checkpoint(state_collection, state):
+    snapshot = dict(state)
+    return lambda: state_collection.replace_one({"_id": snapshot["_id"]}, snapshot, upsert=True)
+
+# Yield (page, checkpoint) pairs of new reviews; calling each checkpoint in order after the page is stored makes the run resumable
+def iter_review_pages(review_collection, state_collection, app_id, lang="id", country="id", page_size=MAX_COUNT_EACH_FETCH, limiter=None):
+    state = load_state(review_collection, state_collection, {"app_id": app_id, "lang": lang, "country": country})
+
+    # Finish the gap left by an interrupted run first
+    resume = state.get("resume")
+    if resume:
+        fetched = False
+        for page, token, reached, exhausted in scan_pages(app_id, lang, country, token_from_doc(resume["token"]), state["at"], set(state["reviewIds"]), page_size, limiter):
+            fetched = fetched or len(page) > 0
+            if not (reached or exhausted):
+                yield page, checkpoint(state_collection, {**state, "resume": {**resume, "token": token_to_doc(token)}})
+                continue
+
+            # An expired token gives nothing back, so let the fresh scan cover the gap instead
+            if reached or fetched:
+                state["at"] = resume["at"]
+                state["reviewIds"] = resume["reviewIds"]
+            state["resume"] = None
+            yield page, checkpoint(state_collection, state)
+
+    pending = None
+    for page, token, reached, exhausted in scan_pages(app_id, lang, country, None, state["at"], set(state["reviewIds"]), page_size, limiter):
+        if pending is None and len(page) > 0:
+            newest_at = page["at"].max()
+            pending = {
+                "at": newest_at.to_pydatetime(),
+                "reviewIds": page.loc[page["at"] == newest_at, "reviewId"].tolist()
+            }
+
+        if reached or exhausted:
+            # The scan reached the old watermark, so move it forward
+            yield page, checkpoint(state_collection, {**state, **(pending or {}), "resume": None})
+        elif pending is not None:
+            yield page, checkpoint(state_collection, {**state, "resume": {**pending, "token": token_to_doc(token)}})
+        else:
+            yield page, checkpoint(state_collection, state)
@@ -1,175 +1,165 @@
 # Import libraries
-import numpy as np
-import pandas as pd
+import argparse
 import os
-import pickle
-import re
-import emoji
-import string
-import openai
+import traceback
 
 # import spacy
 # from spacy.lang.en.stop_words import STOP_WORDS
 
-from google_play_scraper import Sort, reviews, reviews_all, app
 from datetime import datetime, timedelta
+from functools import partial
 from pymongo import MongoClient
+from scraper import iter_review_pages
+from enricher import Enricher
+from rollups import backfill_rollups, update_rollups
+from mongo_schema import ensure_indexes, migrate_sentinels_once, migrate_untagged
+from dedupe import ReviewIdIndex, split_new
+from writer import ReviewWriter
+from pipeline import run_pipeline
+from app_metadata import snapshot_app
+from parquet_export import backfill_export, export_days
+from refresh import ReviewRefresh
+from review_schema import NULLABLE_COLUMNS
+from run_stats import RunStats
+from targets import load_targets, target_label, target_match
+from scheduler import run_targets
 
 # Create a connection to MongoDB
-client = MongoClient(
-    os.environ["MONGODB_URL"],
-    serverSelectionTimeoutMS=300000
-)
-db = client["vidio"]
-collection = db["google_play_store_reviews"]
-collection2 = db["current_timestamp"]
-
-# Load the data from MongoDB
-df = pd.DataFrame(list(collection.find()))
-df = df.drop("_id", axis=1)
-df = df.sort_values("at", ascending=False)
-
-# Collect 5000 new reviews
-result = reviews(
-    "com.vidio.android",
-    lang="id",
-    country="id",
-    sort=Sort.NEWEST,
-    count=5000
-)
-new_reviews = pd.DataFrame(result[0])
-new_reviews = new_reviews.fillna("empty")
-new_reviews = new_reviews.rename(columns={"content": "content_original"})
-
-# Filter the scraped reviews to exclude any that were previously collected
-common = new_reviews.merge(df, on=["reviewId", "userName"])
-new_reviews_sliced = new_reviews[(~new_reviews.reviewId.isin(common.reviewId)) & (~new_reviews.userName.isin(common.userName))]
-
-# Translate all reviews from Indonesian to English
-openai.api_key = os.environ["OPENAI_API_KEY"]
-neg_new_reviews_sliced = new_reviews_sliced[new_reviews_sliced["score"] <= 3]
-
-def translate_to_english(text):
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {
-                "role": "user",
-                "content": f'Please translate this Indonesian text "{text}" to english in the format [EN: translation], but if there is no English translation, return [EN: Cannot be translated]. Please make sure write in the format that I requested only.'
-            }
-        ]
+def connect():
+    client = MongoClient(
+        os.environ["MONGODB_URL"],
+        serverSelectionTimeoutMS=300000
     )
-    return response["choices"][0]["message"]["content"]
-
-english = []
-for i in neg_new_reviews_sliced["content_original"]:
-    translated_text = "[EN: Cannot be translated]"
-    for j in range(5):
-        try:
-            translated_text = translate_to_english(i)
-            break
-        except:
-            pass
-    english.append(translated_text)
-
-def find_invalid_indices(english):
-    invalid_indices = []
-    for i, text in enumerate(english):
-        if not re.match(r'^\[EN: [^\[\]]+\]$', text):
-            invalid_indices.append(i)
-    return invalid_indices
-
-invalid_indices = find_invalid_indices(english)
-
-if len(invalid_indices) > 0:
-    english_revision = []
-    for i in [list(neg_new_reviews_sliced["content_original"])[i] for i in invalid_indices]:
-        translated_text = "[EN: Cannot be translated]"
-        for j in range(5):
-            try:
-                while True:
-                    translated_text = translate_to_english(i)
-                    if re.match(r'^\[EN: [^\[\]]+\]$', translated_text):
-                        break
-                break
-            except:
-                pass
-        english_revision.append(translated_text)
-
-    for i, j in zip(invalid_indices, english_revision):
-        english[i] = j
-
-neg_new_reviews_sliced["content_english"] = english
-
-# Apply topic modeling
-def assign_topic(text):
-    response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {
-                "role": "user",
-                "content": f'Please assign one of the topics (Advertisement, Watching Experience, Package, Technical, Network, Others) to this text "{text}" in the format [Topic: assigned topic]. Please make sure write in the format that I requested only.'
-            }
-        ]
-    )
-    return response["choices"][0]["message"]["content"]
-
-topics = []
-for i in neg_new_reviews_sliced["content_original"]:
-    labeled_topic = "[Topic: Others]"
-    for j in range(5):
+    return client["vidio"]
+
+# Scrape, enrich and store the newest reviews of one target, in its own process when several run at once
+def run_target(target, budget, dry_run=False, refresh_days=0):
+    db = connect()
+    collection = db["google_play_store_reviews"]
+    collection3 = db["ingest_state"]
+    collection4 = db["daily_rollups"]
+    collection5 = db["run_stats"]
+    label = target_label(target)
+
+    # Record how long every stage took and what the LLM calls cost
+    stats = RunStats(model="gpt-3.5-turbo")
+    writer = ReviewWriter(collection)
+    enricher = None
+    refresh = None
+
+    # Refresh the daily rollups of the days the stored reviews landed on, remembering them for the Parquet export
+    touched_days = set()
+
+    def refresh_derived(reviews):
+        with stats.stage("rollups"):
+            update_rollups(collection, collection4, target, reviews["at"])
+        touched_days.update(reviews["at"].dt.normalize())
+
+    # The setup is guarded too, so a target that cannot even start is reported as failed like any other
+    try:
+        # Load the reviewIds already stored, of every target since a review is only stored once
+        with stats.stage("load_review_index"):
+            review_index = ReviewIdIndex.load(collection)
+        pages = iter_review_pages(collection, collection3, target["app_id"], lang=target["lang"], country=target["country"], limiter=budget["pages"])
+
+        if dry_run:
+            # Only count what a real run would store, leaving the watermark untouched
+            n_new = 0
+            n_seen = 0
+            for page, _ in pages:
+                new_reviews, seen = split_new(review_index, page)
+                review_index.add(new_reviews["reviewId"])
+                n_new += len(new_reviews)
+                n_seen += seen
+            print(f"{label}: dry run found {n_new:,} new reviews, {n_seen:,} already stored ({len(review_index):,} reviewIds indexed)")
+            return {"status": "success", "days": []}
+
+        # Translate and label the negative reviews, reusing cached and near-duplicate results
+        enricher = Enricher(db, stats, model=stats.model, budget=budget)
+
+        # Look for edits and developer replies among the reviews of the last few days
+        refresh = ReviewRefresh(db, writer, enricher.enrich)
+
+        # Stream the new reviews page by page until the last-seen review
+        run_pipeline(pages, review_index, enricher.enrich, writer, after_write=refresh_derived, stats=stats)
+
+        if refresh_days > 0:
+            with stats.stage("refresh"):
+                refresh.run(target, refresh_days, limiter=budget["pages"])
+            touched_days.update(refresh.days)
+
+        # Snapshot the store listing so the dashboard never has to scrape it
         try:
-            labeled_topic = assign_topic(i)
-            break
-        except:
-            pass
-    topics.append(labeled_topic)
-
-cleaned_topics = [i for i in topics]
-
-for idx, val in enumerate(cleaned_topics):
-    if "Advertisement" in val:
-        cleaned_topics[idx] = "Advertisement"
-    elif "Watching Experience" in val:
-        cleaned_topics[idx] = "Watching Experience"
-    elif "Package" in val:
-        cleaned_topics[idx] = "Package"
-    elif "Technical" in val:
-        cleaned_topics[idx] = "Technical"
-    elif "Network" in val:
-        cleaned_topics[idx] = "Network"
-    elif "Others" in val:
-        cleaned_topics[idx] = "Others"
-
-neg_new_reviews_sliced["topic"] = cleaned_topics
-
-# Merge neg_new_reviews_sliced to new_reviews_sliced
-new_reviews_sliced_merged = pd.merge(new_reviews_sliced, neg_new_reviews_sliced[["topic"]], left_index=True, right_index=True, how="outer")
-new_reviews_sliced_merged = pd.merge(new_reviews_sliced_merged, neg_new_reviews_sliced[["content_english"]], left_index=True, right_index=True, how="outer")
-new_reviews_sliced_merged = new_reviews_sliced_merged[["reviewId", "userName", "userImage", "content_original", "content_english", "score", "thumbsUpCount", "reviewCreatedVersion", "at", "replyContent", "repliedAt", "topic"]]
-new_reviews_sliced_merged = new_reviews_sliced_merged.fillna("empty")
-
-# Update MongoDB with any new reviews that were not previously scraped
-if len(new_reviews_sliced_merged) > 0:
-    new_reviews_sliced_merged_dict = new_reviews_sliced_merged.to_dict("records")
-
-    batch_size = 1_000
-    num_records = len(new_reviews_sliced_merged_dict)
-    num_batches = num_records // batch_size
-
-    if num_records % batch_size != 0:
-        num_batches += 1
-
-    for i in range(num_batches):
-        start_idx = i * batch_size
-        end_idx = min(start_idx + batch_size, num_records)
-        batch = new_reviews_sliced_merged_dict[start_idx:end_idx]
-
-        if batch:
-            collection.insert_many(batch)
-
-# Insert the current timestamp to MongoDB
-current_datetime = datetime.now()
-updated_datetime = current_datetime + timedelta(hours=7)
-current_timestamp = updated_datetime.strftime("%A, %B %d %Y at %H:%M:%S")
-collection2.replace_one({}, {"timestamp": current_timestamp}, upsert=True)
\ No newline at end of file
+            with stats.stage("app_snapshot"):
+                if budget["pages"] is not None:
+                    budget["pages"].wait()
+                snapshot = snapshot_app(db["app_snapshots"], target)
+            print(f"{label}: app snapshot with {snapshot['installs']} installs, {snapshot['ratings']} ratings")
+        except Exception as error:
+            print(f"{label}: could not snapshot the app listing: {error}")
+    except Exception as error:
+        stats.fail(error)
+        traceback.print_exc()
+    finally:
+        # Keep a record of every run, failed ones included, for the dashboard; a dry run leaves no record
+        if not dry_run:
+            refreshed = refresh is not None and refresh_days > 0
+            enricher_reports = enricher.reports() if enricher is not None else []
+            refresh_reports = [refresh.report()] if refreshed else []
+            print(f"{label}:\n" + "\n".join([*enricher_reports, *refresh_reports, writer.report(), stats.report()]))
+            collection5.insert_one(stats.to_doc(
+                **target_match(target),
+                write={"documents": writer.written, "seconds": writer.seconds, "docs_per_second": writer.written / writer.seconds if writer.seconds > 0 else 0},
+                refresh=refresh.to_doc() if refreshed else None,
+                **(enricher.to_doc() if enricher is not None else {})
+            ))
+    return {"status": "success" if stats.status == "running" else stats.status, "days": sorted(touched_days)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape, enrich and store the newest reviews of every configured app and locale.")
+    parser.add_argument("--dry-run", action="store_true", help="only report how many scraped reviews are new, without enriching or storing anything")
+    parser.add_argument("--refresh-days", type=int, default=int(os.environ.get("REFRESH_DAYS", 0)), help="also re-scan the reviews of the last N days and update the edited or replied ones, 0 to skip")
+    parser.add_argument("--processes", type=int, default=int(os.environ.get("SCRAPING_PROCESSES", 4)), help="targets scraped at the same time, each in its own process")
+    args = parser.parse_args()
+
+    db = connect()
+    collection = db["google_play_store_reviews"]
+    collection2 = db["current_timestamp"]
+
+    # A dry run changes nothing, so the migrations and the unique reviewId swap wait for a real run
+    if not args.dry_run:
+        # Tag what was stored before there were several targets
+        if migrate_untagged(db):
+            print(f"Rebuilt {backfill_rollups(collection, db['daily_rollups']):,} daily rollups per target")
+
+        # Null out the "empty" sentinels of documents stored by the first version of the job, which the refresh and the export cannot read
+        n_migrated = migrate_sentinels_once(db, NULLABLE_COLUMNS)
+        if n_migrated > 0:
+            print(f"Replaced the sentinel values of {n_migrated:,} fields with nulls")
+            if "PARQUET_EXPORT_PATH" in os.environ:
+                n_exported, n_days = backfill_export(collection, os.environ["PARQUET_EXPORT_PATH"])
+                print(f"Parquet export: rewrote {n_exported:,} reviews in {n_days:,} daily partitions")
+
+    # Make sure every lookup hits an index
+    ensure_indexes(db, unique_review_id=not args.dry_run)
+
+    targets = load_targets()
+    results = run_targets(partial(run_target, dry_run=args.dry_run, refresh_days=args.refresh_days), targets, args.processes)
+    failed = [target_label(target) for target, result in zip(targets, results) if result["status"] != "success"]
+
+    if not args.dry_run:
+        # Rewrite the Parquet partitions of the days that got new reviews, once for all targets
+        if "PARQUET_EXPORT_PATH" in os.environ:
+            touched_days = {day for result in results for day in result["days"]}
+            n_exported, n_days = export_days(collection, os.environ["PARQUET_EXPORT_PATH"], touched_days)
+            print(f"Parquet export: {n_exported:,} reviews in {n_days:,} daily partitions")
+
+        # Insert the current timestamp to MongoDB
+        if len(failed) < len(targets):
+            current_datetime = datetime.now()
+            updated_datetime = current_datetime + timedelta(hours=7)
+            current_timestamp = updated_datetime.strftime("%A, %B %d %Y at %H:%M:%S")
+            collection2.replace_one({}, {"timestamp": current_timestamp}, upsert=True)
+
+    if len(failed) > 0:
+        raise SystemExit(f"Failed targets: {', '.join(failed)}")
@@ -0,0 +1,31 @@
+# Import libraries
+import json
+import os
+
+# Fields every stored review, rollup, snapshot and run record is tagged with
+TARGET_FIELDS = ["app_id", "lang", "country"]
+
+# What the job scraped before targets were configurable, and what untagged documents belong to
+DEFAULT_TARGET = {"app_id": "com.vidio.android", "lang": "id", "country": "id"}
+
+# Apps and locales to scrape, read from a JSON list like [{"app_id": "com.vidio.android", "lang": "id", "country": "id"}]
+def load_targets(path=None):
+    path = path or os.environ.get("TARGETS_PATH", "targets.json")
+    if not os.path.exists(path):
+        return [DEFAULT_TARGET]
+
+    with open(path) as file:
+        targets = [{field: target[field] for field in TARGET_FIELDS} for target in json.load(file)]
+    if len({target_key(target) for target in targets}) != len(targets):
+        raise ValueError(f"{path} lists the same app and locale twice")
+    return targets
+
+def target_key(target):
+    return ":".join(target[field] for field in TARGET_FIELDS)
+
+def target_label(target):
+    return f"{target['app_id']} ({target['lang']}-{target['country'].upper()})"
+
+# Filter matching the documents of one target, leading every target-scoped index
+def target_match(target):
+    return {field: target[field] for field in TARGET_FIELDS}
@@ -0,0 +1,99 @@
+# Import libraries
+import argparse
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+from pymongo import MongoClient
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from topics import TOPICS
+from mongo_schema import TRAINING_PROJECTION
+
+MODEL_PATH = os.path.join("models", "topic_classifier.pkl")
+
+# Local classifier that labels confident reviews without calling the LLM
+class TopicClassifier:
+    def __init__(self, artifact, threshold=0.8):
+        self.model = artifact["model"]
+        self.version = artifact["version"]
+        self.threshold = threshold
+        self.labeled = 0
+        self.deferred = 0
+
+    @classmethod
+    def load(cls, path=MODEL_PATH, threshold=0.8):
+        with open(path, "rb") as f:
+            return cls(pickle.load(f), threshold)
+
+    # Return the topic of every review, or None where the model is not confident enough
+    def predict(self, texts):
+        texts = [str(text).lower() for text in texts]
+        if len(texts) == 0:
+            return []
+
+        proba = self.model.predict_proba(texts)
+        labels = self.model.classes_[proba.argmax(axis=1)]
+        confident = proba.max(axis=1) >= self.threshold
+
+        self.labeled += int(confident.sum())
+        self.deferred += int((~confident).sum())
+        return [f"[Topic: {label}]" if ok else None for label, ok in zip(labels, confident)]
+
+    def report(self):
+        return f"Topic classifier {self.version}: {self.labeled} labeled locally, {self.deferred} sent to the LLM"
+
+def train(df, test_size=0.2, threshold=0.8):
+    texts = df["content_original"].astype(str).str.lower()
+    x_train, x_test, y_train, y_test = train_test_split(texts, df["topic"].to_numpy(), test_size=test_size, stratify=df["topic"], random_state=42)
+
+    model = make_pipeline(
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), min_df=2, sublinear_tf=True),
+        LogisticRegression(max_iter=1_000, class_weight="balanced")
+    )
+    model.fit(x_train, y_train)
+
+    # Check how many held-out reviews clear the threshold and how often those are right
+    proba = model.predict_proba(x_test)
+    predicted = model.classes_[proba.argmax(axis=1)]
+    confident = proba.max(axis=1) >= threshold
+    metrics = {
+        "accuracy": float(np.mean(predicted == y_test)),
+        "coverage": float(np.mean(confident)),
+        "confident_accuracy": float(np.mean(predicted[confident] == y_test[confident])) if confident.any() else 0.0
+    }
+
+    # Refit on every labeled review for the shipped model
+    model.fit(texts, df["topic"])
+    return model, metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local topic classifier on the GPT labels stored in MongoDB.")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--output", default=MODEL_PATH)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    client = MongoClient(
+        os.environ["MONGODB_URL"],
+        serverSelectionTimeoutMS=300000
+    )
+    collection = client["vidio"]["google_play_store_reviews"]
+    df = pd.DataFrame(list(collection.find({"topic": {"$in": TOPICS}}, TRAINING_PROJECTION)))
+
+    model, metrics = train(df, threshold=args.threshold)
+    version = datetime.now().strftime("%Y%m%d%H%M%S")
+    artifact = {"version": version, "model": model, "labels": TOPICS, "n_samples": len(df), "metrics": metrics}
+
+    # Keep a copy per version next to the one the daily job loads
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    for path in [args.output, args.output.replace(".pkl", f"-{version}.pkl")]:
+        with open(path, "wb") as f:
+            pickle.dump(artifact, f)
+
+    print(f"Trained topic classifier {version} on {len(df):,} reviews")
+    print(f"Held-out accuracy {metrics['accuracy']:.1%}, {metrics['coverage']:.1%} above the {args.threshold} threshold with {metrics['confident_accuracy']:.1%} accuracy")
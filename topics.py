@@ -0,0 +1,42 @@
+# Import libraries
+import re
+import pandas as pd
+
+# Topics the reviews can be assigned to, in display order
+TOPICS = ["Advertisement", "Watching Experience", "Package", "Technical", "Network", "Others"]
+
+# Other spellings the LLM answers with, mapped to their topic
+TOPIC_ALIASES = {
+    "Advertisements": "Advertisement",
+    "Advertising": "Advertisement",
+    "Ads": "Advertisement",
+    "Iklan": "Advertisement",
+    "Watching": "Watching Experience",
+    "Viewing Experience": "Watching Experience",
+    "Streaming Experience": "Watching Experience",
+    "Packages": "Package",
+    "Subscription": "Package",
+    "Paket": "Package",
+    "Technical Issue": "Technical",
+    "Technical Issues": "Technical",
+    "Network Issue": "Network",
+    "Network Issues": "Network",
+    "Connection": "Network",
+    "Other": "Others"
+}
+
+# Any topic or alias, longest first so "Advertisements" wins over "Advertisement"
+TOPIC_LOOKUP = {**{topic.lower(): topic for topic in TOPICS}, **{alias.lower(): topic for alias, topic in TOPIC_ALIASES.items()}}
+TOPIC_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(TOPIC_LOOKUP, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+# Map raw LLM answers like "[Topic: Ads]" to their topic, falling back to Others
+def normalize_topics(values):
+    matched = pd.Series(values, dtype="object").astype(str).str.extract(TOPIC_PATTERN, expand=False)
+    return matched.str.lower().map(TOPIC_LOOKUP).fillna("Others")
+
+def normalize_topic(value):
+    match = TOPIC_PATTERN.search(str(value))
+    return TOPIC_LOOKUP[match.group(1).lower()] if match is not None else None
@@ -0,0 +1,94 @@
+# Import libraries
+import random
+import threading
+import time
+import bson
+
+from pymongo import UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, ExecutionTimeout, NetworkTimeout
+from targets import TARGET_FIELDS
+
+# Error codes worth retrying inside a bulk write, 11000 being two upserts racing on the same reviewId
+RETRYABLE_CODES = {11000, 6, 7, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+# Fields only written when the review is inserted, so a target scraping a review another target already stored neither re-tags it nor replaces its enrichment
+INSERT_ONLY_FIELDS = [*TARGET_FIELDS, "content_english", "topic"]
+
+def to_update(doc, insert_only):
+    update = {"$set": {field: value for field, value in doc.items() if field not in insert_only}}
+    on_insert = {field: value for field, value in doc.items() if field in insert_only}
+    if len(on_insert) > 0:
+        update["$setOnInsert"] = on_insert
+    return update
+
+# Idempotent writer that upserts reviews by reviewId in size-bounded, unordered batches
+class ReviewWriter:
+    def __init__(self, collection, max_batch_bytes=4_000_000, max_batch_docs=5_000, max_retries=5, base_delay=1):
+        self.collection = collection
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_docs = max_batch_docs
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.written = 0
+        self.seconds = 0
+        # Backfill workers write at the same time, so `seconds` is the wall time any write was running rather than the sum over threads
+        self.lock = threading.Lock()
+        self.active = 0
+        self.active_since = None
+
+    # Split the documents so every batch stays under the byte and document limits
+    def batches(self, docs):
+        batch = []
+        batch_bytes = 0
+        for doc in docs:
+            doc_bytes = len(bson.encode(doc))
+            if len(batch) > 0 and (batch_bytes + doc_bytes > self.max_batch_bytes or len(batch) == self.max_batch_docs):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(doc)
+            batch_bytes += doc_bytes
+        if len(batch) > 0:
+            yield batch
+
+    def write_batch(self, batch, insert_only):
+        requests = [UpdateOne({"reviewId": doc["reviewId"]}, to_update(doc, insert_only), upsert=True) for doc in batch]
+        for attempt in range(self.max_retries):
+            try:
+                self.collection.bulk_write(requests, ordered=False)
+                return
+            except BulkWriteError as error:
+                # Retry only the operations that failed for a transient reason
+                failed = error.details["writeErrors"]
+                if attempt == self.max_retries - 1 or any(e["code"] not in RETRYABLE_CODES for e in failed):
+                    raise
+                # A write concern error does not say which writes are safe, so the whole batch is upserted again
+                if len(failed) > 0 and len(error.details.get("writeConcernErrors", [])) == 0:
+                    requests = [requests[e["index"]] for e in failed]
+            except (AutoReconnect, NetworkTimeout, ExecutionTimeout):
+                if attempt == self.max_retries - 1:
+                    raise
+            time.sleep(random.uniform(0, self.base_delay * 2 ** attempt))
+
+    def write(self, docs, insert_only=INSERT_ONLY_FIELDS):
+        with self.lock:
+            if self.active == 0:
+                self.active_since = time.perf_counter()
+            self.active += 1
+
+        n_docs = 0
+        try:
+            for batch in self.batches(docs):
+                self.write_batch(batch, insert_only)
+                n_docs += len(batch)
+        finally:
+            with self.lock:
+                self.written += n_docs
+                self.active -= 1
+                if self.active == 0:
+                    self.seconds += time.perf_counter() - self.active_since
+        return n_docs
+
+    def report(self):
+        rate = self.written / self.seconds if self.seconds > 0 else 0
+        return f"Review writer: {self.written:,} documents upserted in {self.seconds:.1f}s ({rate:,.0f} docs/s)"